@@ -17,9 +17,12 @@ import pandas as pd
 import copy
 import os
 import pickle
-from typing import Union, Tuple
+from typing import Dict, List, Union, Tuple
+import warnings
 
+import batch
 import config
+import curves
 import data
 import correlation
 import events
@@ -32,7 +35,6 @@ mask_frq_limit = 1.1
 # TODO make plot() its own function - code duplication
 
 
-# TODO def applyMaskBadFrequency(): return masked data
 def maskBadFrequencies(datapoint: Union[data.DataPoint, np.ndarray], limit: float = mask_frq_limit) -> np.array([bool]):
     """
     dynamic frequency filter to filter frequencies with irregular noise
@@ -44,7 +46,7 @@ def maskBadFrequencies(datapoint: Union[data.DataPoint, np.ndarray], limit: floa
     :return: np.array[bool] mask array what frequencies to keep
     """
     if isinstance(datapoint, data.DataPoint):
-        dpt = copy.deepcopy(datapoint)
+        dpt = copy.copy(datapoint)
         dpt.subtractBackground()
         data_ = dpt.spectrum_data.data
     elif isinstance(datapoint, np.ndarray):
@@ -68,6 +70,33 @@ def maskBadFrequencies(datapoint: Union[data.DataPoint, np.ndarray], limit: floa
     return mask
 
 
+def applyMaskBadFrequency(datapoint: data.DataPoint, limit: float = mask_frq_limit) -> np.array([bool]):
+    """
+    sets frequencies with irregular noise (see maskBadFrequencies()) to the mean of the spectrum
+
+    copy on write: the spectrum gets replaced instead of changed in place, so it may be a view of another one
+    (see data.DataPoint.cutToTime())
+
+    :param datapoint: Input data
+    :param limit: see maskBadFrequencies()
+    :return: np.array[bool] mask array of the frequencies that got replaced
+    """
+    key = (datapoint.data_id, "mask_frequencies", limit)
+    mask = data.getDerived(key)
+    if mask is None:
+        mask = maskBadFrequencies(datapoint, limit=limit)
+        data.storeDerived(key, mask)
+    if np.any(mask):
+        data_ = data.getDerived(key + ("applied",))
+        if data_ is None:
+            data_ = datapoint.spectrum_data.data.copy()
+            data_[mask, :] = np.nanmean(datapoint.spectrum_data.data)
+            data.storeDerived(key + ("applied",), data_)
+        datapoint.spectrum_data = datapoint.spectrum_data._with_data(data_)
+        datapoint.dataChanged(key + ("applied",))
+    return mask
+
+
 def maskBadFrequenciesPlot(datapoint: data.DataPoint, limit: float = mask_frq_limit, save_img: bool = False) \
         -> np.array([bool]):
     """
@@ -143,7 +172,8 @@ def calcPoint(*date: Union[int, datetime], obs1: Union[stations.Station, str], o
               mask_frq: bool or None = None, limit_frq: bool = mask_frq_limit, extent: bool = True,
               limit: float or None = None, flatten: float or None = None, bin_time: float = None,
               bin_freq: bool = None, no_bg: bool = None, r_window: int = None, flatten_window: int = None,
-              bin_time_width: int = None, method_bin_t: str = None, method_bin_f: str = None) \
+              bin_time_width: int = None, method_bin_t: str = None, method_bin_f: str = None,
+              curve_store: bool = False) \
         -> Tuple[data.DataPoint, data.DataPoint, correlation.Correlation] or None:
     """
     Calculates via correlation method whether there are possible bursts in two spectra.
@@ -172,6 +202,8 @@ def calcPoint(*date: Union[int, datetime], obs1: Union[stations.Station, str], o
     :param r_window: rolling window correlation method
     :param method_bin_t: str - toggle between mean and median
     :param method_bin_f: str - toggle between mean and median
+    :param curve_store: reuse the summed curves of earlier runs with the same parameters and store new ones
+        (see curves.py), required for DataPoints with curves_only
     :return: datapoint 1, datapoint 2, correlation | None if either DataPoint can't be loaded
     """
     if limit is None:
@@ -207,26 +239,41 @@ def calcPoint(*date: Union[int, datetime], obs1: Union[stations.Station, str], o
     if data_point_1.spectrum_data is None or data_point_2.spectrum_data is None:
         return
 
-    if mask_frq:
-        data_1 = copy.deepcopy(data_point_1.spectrum_data.data)
-        data_2 = copy.deepcopy(data_point_2.spectrum_data.data)
-        mask1 = maskBadFrequencies(data_point_1, limit=limit_frq)
-        mask2 = maskBadFrequencies(data_point_2, limit=limit_frq)
-        mean_1 = np.nanmean(data_1)
-        mean_2 = np.nanmean(data_2)
-        data_point_1.spectrum_data.data[mask1, :] = mean_1
-        data_point_2.spectrum_data.data[mask2, :] = mean_2
+    stored = None
+    if curve_store:
+        frequency_range = tuple(curves.frequencyRange(data_point_1, data_point_2))
+        processing = dict(mask_frq=mask_frq, limit_frq=limit_frq, no_bg=no_bg, bin_time=bin_time,
+                          bin_time_width=bin_time_width, method_bin_t=method_bin_t, bin_freq=bin_freq,
+                          method_bin_f=method_bin_f)
+        stored = []
+        for data_point in [data_point_1, data_point_2]:
+            bands, pieces = stationCurves(data_point, [frequency_range], True, **processing)
+            stored.append(None if bands is None else curves.rangeCurve(bands, pieces, list(frequency_range)))
+        if stored[0] is None or stored[1] is None:
+            stored = None
+        else:
+            stored = tuple(cleanedCurve(i, flatten, flatten_window) for i in stored)
+    if stored is None and (data_point_1.curves_only or data_point_2.curves_only):
+        warnings.warn(message=f"summed curves of {data_point_1.observatory} and {data_point_2.observatory} "
+                              f"not in the curve store", category=UserWarning)
+        return
+
+    if mask_frq and stored is None:
+        applyMaskBadFrequency(data_point_1, limit=limit_frq)
+        applyMaskBadFrequency(data_point_2, limit=limit_frq)
     else:
         pass
 
-    dp1_cor = copy.deepcopy(data_point_1)
-    dp2_cor = copy.deepcopy(data_point_2)
+    dp1_cor = copy.copy(data_point_1)
+    dp2_cor = copy.copy(data_point_2)
 
     cor = correlation.Correlation(dp1_cor, dp2_cor, day=date_.day,
                                   flatten=flatten, bin_time=bin_time, bin_freq=bin_freq, no_background=no_bg,
                                   r_window=r_window, flatten_window=flatten_window, bin_time_width=bin_time_width,
-                                  method_bin_t=method_bin_t, method_bin_f=method_bin_f)
+                                  method_bin_t=method_bin_t, method_bin_f=method_bin_f, curves=stored)
     cor.calculatePeaks(limit=limit)
+    if data_point_1.curves_only or data_point_2.curves_only:
+        return data_point_1, data_point_2, cor
 
     data_point_1.createSummedCurve()
     data_point_2.createSummedCurve()
@@ -240,6 +287,205 @@ def calcPoint(*date: Union[int, datetime], obs1: Union[stations.Station, str], o
     return data_point_1, data_point_2, cor
 
 
+def summedCurve(data_point: data.DataPoint, frequency_range: List[float], mask_frq: bool, limit_frq: float,
+                no_bg: bool, bin_time: bool, bin_time_width: int, method_bin_t: str, bin_freq: bool,
+                method_bin_f: str, flatten: bool, flatten_window: int) -> np.ndarray:
+    """
+    summed curve of a DataPoint, processed like in calcPoint() (see there for the parameters)
+
+    :param data_point: unprocessed DataPoint, doesn't get changed
+    :param frequency_range: lower and upper frequency, common range of the pair (see curves.frequencyRange())
+    :return: summed curve
+    """
+    data_point_ = processedCopy(data_point, mask_frq, limit_frq, no_bg, bin_time, bin_time_width, method_bin_t,
+                                bin_freq, method_bin_f)
+    correlation.setupSummedCurve(data_point_, frequency_range, flatten, flatten_window)
+    return data_point_.summed_curve
+
+
+def processedCopy(data_point: data.DataPoint, mask_frq: bool, limit_frq: float, no_bg: bool, bin_time: bool,
+                  bin_time_width: int, method_bin_t: str, bin_freq: bool, method_bin_f: str) -> data.DataPoint:
+    """
+    copy of a DataPoint, processed like in calcPoint() (see there for the parameters)
+
+    :param data_point: unprocessed DataPoint, doesn't get changed
+    :return: processed copy
+    """
+    data_point_ = copy.copy(data_point)
+    if mask_frq:
+        applyMaskBadFrequency(data_point_, limit=limit_frq)
+    if no_bg:
+        data_point_.subtractBackground()
+    if bin_time:
+        data_point_.binDataTime(width=bin_time_width, method=method_bin_t)
+    if bin_freq:
+        data_point_.binDataFreq(method=method_bin_f)
+    return data_point_
+
+
+def stationCurves(data_point: data.DataPoint, frequency_ranges: List[Tuple[float, float]], curve_store: bool,
+                  mask_frq: bool, limit_frq: float, no_bg: bool, bin_time: bool, bin_time_width: int,
+                  method_bin_t: str, bin_freq: bool, method_bin_f: str) \
+        -> (Union[np.ndarray, None], Dict[tuple, np.ndarray]):
+    """
+    band curves of a DataPoint and the curves of the pieces at the edges of frequency ranges (see curves.bandPieces()),
+    processed like in calcPoint() (see there for the parameters), with curve_store from the curve store, curves that
+    aren't stored yet get computed and stored
+
+    :param data_point: unprocessed DataPoint, doesn't get changed
+    :param frequency_ranges: lower and upper frequency of every summed curve
+    :param curve_store: see calcPoint()
+    :return: band curves, None if they are neither stored nor computable (DataPoints with curves_only), curves of the
+        pieces, pieces that are neither stored nor computable are missing
+    """
+    parameters_ = curves.parameters(mask_frq, limit_frq, no_bg, bin_time, bin_time_width, method_bin_t, bin_freq,
+                                    method_bin_f)
+    processing = dict(mask_frq=mask_frq, limit_frq=limit_frq, no_bg=no_bg, bin_time=bin_time,
+                      bin_time_width=bin_time_width, method_bin_t=method_bin_t, bin_freq=bin_freq,
+                      method_bin_f=method_bin_f)
+    # processed only if something isn't stored
+    data_point_ = None
+
+    key = curves.bandsKey(data_point, parameters_) if curve_store else None
+    bands = None if key is None else curves.loadCurves(key)
+    if bands is None and not data_point.curves_only:
+        data_point_ = processedCopy(data_point, **processing)
+        bands = data_point_.createBandCurves(config.curve_band_width)
+        if curve_store:
+            curves.storeCurves(key, bands)
+
+    pieces = {}
+    for frequency_range in frequency_ranges:
+        for piece in curves.bandPieces(list(frequency_range)):
+            if curves.fullBand(piece) or piece in pieces:
+                continue
+            key = curves.pieceKey(data_point, parameters_, piece) if curve_store else None
+            curve = None if key is None else curves.loadCurves(key)
+            if curve is None and not data_point.curves_only:
+                if data_point_ is None:
+                    data_point_ = processedCopy(data_point, **processing)
+                curve = data_point_.bandCurve(piece[0], config.curve_band_width, list(piece[1:]))
+                if curve_store:
+                    curves.storeCurves(key, curve)
+            if curve is not None:
+                pieces[piece] = curve
+    return bands, pieces
+
+
+def cleanedCurve(curve: np.ndarray, flatten: bool, flatten_window: int) -> np.ndarray:
+    """
+    like correlation.setupSummedCurve() for a summed curve of band curves (see curves.rangeCurve())
+
+    :param curve: summed curve, doesn't get changed
+    :param flatten: toggle median subtraction
+    :param flatten_window: if 'flatten': rolling window size
+    :return: summed curve
+    """
+    curve = np.array(curve)
+    data.cleanSummedCurve(curve)
+    if flatten:
+        curve = data.detrendCurve(curve, data.flattenWindow(len(curve), flatten_window))
+    return curve
+
+
+def calcPairs(*date: Union[int, datetime], data_sets: List[data.DataPoint], limit: float, mask_frq: bool = False,
+              limit_frq: float = mask_frq_limit, flatten: bool = True, bin_time: bool = True, bin_freq: bool = False,
+              no_bg: bool = True,
+              r_window: int = correlation.default_r_window,
+              flatten_window: int = correlation.default_flatten_window,
+              bin_time_width: int = correlation.default_time_window, method_bin_t: str = 'median',
+              method_bin_f: str = 'median', curve_store: bool = False) -> events.EventList:
+    """
+    bursts of all pairs of DataPoints, same events as calcPoint() for every pair (see steps.firstStep()),
+    without a Correlation per pair:
+    the band curves of all DataPoints make up one batch (see batch.StationDayBatch and stationCurves()), with
+    curve_store from the curve store. every summed curve (DataPoint and common frequency range of a pair) gets summed
+    up from the batch and processed once, and its rolling sums get computed once (see batch.RollingCurves), a pair only
+    needs the sums of the products of its curves.
+    the curves get mapped to the canonical time grid once (see data.gridIndices()), so pairs line up by integer offsets
+
+    :param date: Datetime or (3+) Ints to create DateTime (year, month, day), date of the EventList
+    :param data_sets: DataPoints
+    :param limit: min correlation required to recognise burst
+    :param curve_store: see calcPoint()
+    :return: events of all pairs
+    """
+    processing = dict(mask_frq=mask_frq, limit_frq=limit_frq, no_bg=no_bg, bin_time=bin_time,
+                      bin_time_width=bin_time_width, method_bin_t=method_bin_t, bin_freq=bin_freq,
+                      method_bin_f=method_bin_f)
+    data_per_second = [correlation.DATA_POINTS_PER_SECOND,
+                       correlation.DATA_POINTS_PER_SECOND / bin_time_width][bin_time]
+
+    pairs = []
+    for i, data_point_1 in enumerate(data_sets):
+        for j in range(i + 1, len(data_sets)):
+            data_point_2 = data_sets[j]
+            if data_point_1 and data_point_2 and data_point_1.observatory != data_point_2.observatory:
+                pairs.append((i, j, tuple(curves.frequencyRange(data_point_1, data_point_2))))
+
+    frequency_ranges = {}
+    for i, j, frequency_range in pairs:
+        for k in [i, j]:
+            if frequency_range not in frequency_ranges.setdefault(k, []):
+                frequency_ranges[k].append(frequency_range)
+
+    # band curves of all stations, in one batch
+    members = []
+    bands = []
+    pieces = []
+    rates = []
+    for k, ranges in frequency_ranges.items():
+        bands_, pieces_ = stationCurves(data_sets[k], ranges, curve_store, **processing)
+        if bands_ is not None:
+            members.append(k)
+            bands.append(bands_)
+            pieces.append(pieces_)
+            # see correlation.Correlation.modulateData()
+            rates.append(data_sets[k].dataPerSecond() / [1, bin_time_width][bin_time])
+    day_batch = batch.createBatch([data_sets[k] for k in members], bands, pieces, rates, config.curve_band_width)
+    del bands, pieces
+
+    # summed curves on the grid, one per DataPoint and frequency range
+    index = {}
+    summed_curves = []
+    offsets = []
+    for station, k in enumerate(members):
+        for frequency_range in frequency_ranges[k]:
+            curve = day_batch.summedCurve(station, frequency_range)
+            index[(k, frequency_range)] = None if curve is None else len(summed_curves)
+            if curve is not None:
+                curve = cleanedCurve(curve, flatten, flatten_window)
+                offset, curve = data.curveOnGrid(curve, day_batch.starts[station].timestamp(),
+                                                 day_batch.points_per_second[station], data_per_second)
+                summed_curves.append(curve)
+                offsets.append(offset)
+    del day_batch
+    rolling = batch.RollingCurves(summed_curves, r_window)
+    lengths = [len(curve) for curve in summed_curves]
+    del summed_curves
+    print(len(pairs), "permutations to go")
+
+    e_list = events.EventList([], config.getDateFromArgs(*date))
+    for number, (i, j, frequency_range) in enumerate(pairs):
+        print(f"Start permutations of {data_sets[i].observatory} ({number + 1:6} / {len(pairs):6})", end="\r")
+        data_point_1, data_point_2 = data_sets[i], data_sets[j]
+        index_1, index_2 = index.get((i, frequency_range)), index.get((j, frequency_range))
+        if index_1 is None or index_2 is None:
+            warnings.warn(message=f"summed curves of {data_point_1.observatory} and {data_point_2.observatory} "
+                                  f"not in the curve store", category=UserWarning)
+            continue
+        ranges = correlation.gridRanges(offsets[index_1], lengths[index_1], offsets[index_2], lengths[index_2])
+        data_curve = rolling.correlate(index_1, ranges[0], index_2, ranges[1])
+        if not np.any(data_curve > limit):
+            continue
+        time_start = max(offsets[index_1], offsets[index_2]) / data_per_second
+        peaks = correlation.findPeaks(data_curve, time_start, data_per_second, data_point_1.spectrum_data.start.day,
+                                      [data_point_1.observatory, data_point_2.observatory], limit=limit)
+        if peaks:
+            e_list += events.EventList(peaks, data_point_1.spectrum_data.start)
+    return e_list
+
+
 def plotDatapoint(datapoint: data.DataPoint, curve: bool = False, save_img: bool = False, folder: str = "", short_name=False) -> None:
     """
     Creates a (pretty) Plot of a datapoint.
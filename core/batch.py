@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - batch.py -
+
+all stations of a day at once (see analysis.calcPairs()): the band curves of all stations in one array
+(station, band, time), rolling sums of the summed curves of all stations get computed once, instead of once per pair
+low level
+"""
+
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+import correlation
+import curves
+import data
+
+
+class StationDayBatch:
+    """
+    summed curves of the standard frequency bands (see data.DataPoint.createBandCurves()) of several stations
+
+    data: (station, band, time), row k is band first_band + k, time in values of each station from its start, bands
+    and values that a station doesn't have are nan.
+    the curves stay on the time axis of their station: flattening counts values of the station (see
+    data.flattenWindow()), curves only get mapped to the canonical time grid (see data.curveOnGrid()) afterwards
+    valid: (station, time), False where a station has no value (padding, gaps)
+    pieces: for every station the curves of the parts of the bands at the edges of frequency ranges (see
+    curves.bandPieces())
+    """
+    def __init__(self, data_: np.ndarray, valid: np.ndarray, first_band: int, pieces: List[Dict[tuple, np.ndarray]],
+                 data_points: List[data.DataPoint], points_per_second: np.ndarray, lengths: np.ndarray):
+        """
+        :param data_: band curves (station, band, time)
+        :param valid: (station, time)
+        :param first_band: band of the first row
+        :param pieces: curves of the pieces of every station
+        :param data_points: metadata of every station (observatory, frequency range, start, ...)
+        :param points_per_second: values per second of every station
+        :param lengths: number of values of every station
+        """
+        self.data = data_
+        self.valid = valid
+        self.first_band = first_band
+        self.pieces = pieces
+        self.data_points = data_points
+        self.points_per_second = points_per_second
+        self.lengths = lengths
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def shape(self) -> (int, int, int):
+        """
+        :return: number of stations, bands, values
+        """
+        return self.data.shape
+
+    @property
+    def stations(self) -> list:
+        """
+        :return: observatory of every station
+        """
+        return [i.observatory for i in self.data_points]
+
+    @property
+    def starts(self) -> List[datetime]:
+        """
+        :return: time of the first value of every station
+        """
+        return [i.spectrum_data.start for i in self.data_points]
+
+    def summedCurve(self, station: int, frequency_range: List[float]) -> Union[np.ndarray, None]:
+        """
+        :param station: index of the station
+        :param frequency_range: lower and upper frequency
+        :return: summed curve of the frequency range (see curves.rangeCurve()), before setting low values to the
+            median and flattening, None if a piece at the edges is missing
+        """
+        return curves.rangeCurve(self.data[station, :, :self.lengths[station]], self.pieces[station],
+                                 list(frequency_range), self.first_band)
+
+
+class RollingCurves:
+    """
+    rolling sums over a window of several curves (e.g. the summed curves of all stations of a day), computed once:
+    the rolling correlation of two of them (like correlation.rollingCorrelation()) only needs the sums of their
+    products then
+    """
+    def __init__(self, curves: List[np.ndarray], window: int):
+        """
+        :param curves: curves, nan (or masked) where a curve has no value
+        :param window: number of values per window
+        """
+        self.window = window
+        self.values = []
+        self.sums = []
+        self.roots = []
+        self.missing = []
+        self.constant = []
+        for curve in curves:
+            values = np.array(np.ma.filled(np.ma.asarray(curve, dtype=np.float64), np.nan))
+            valid = np.isfinite(values)
+            values[~valid] = 0
+            # centered, like in correlation.rollingCorrelation()
+            values -= np.sum(values) / max(np.count_nonzero(valid), 1) * valid
+            self.values.append(values)
+            if len(values) < window or window < 2:
+                empty = np.empty(0)
+                self.sums.append(empty)
+                self.roots.append(empty)
+                self.missing.append(empty.astype(bool))
+                self.constant.append(empty.astype(bool))
+                continue
+            sum_x, sum_xx = correlation.rollingSums(np.stack([values, values * values]), window)
+            self.sums.append(sum_x)
+            self.roots.append(correlation.deviationRoots(sum_x, sum_xx, window))
+            self.missing.append(correlation.countWindows(~valid, window) > 0)
+            self.constant.append(correlation.countWindows(values[1:] != values[:-1], window - 1) == 0)
+
+    def __len__(self):
+        return len(self.values)
+
+    def correlate(self, index_1: int, range_1: Tuple[int, int], index_2: int, range_2: Tuple[int, int]) -> np.ndarray:
+        """
+        rolling correlation of the parts of two curves, same values as
+        correlation.rollingCorrelation(curve_1[range_1[0]:range_1[1]], curve_2[range_2[0]:range_2[1]], window)
+        up to rounding
+
+        :param index_1: index of the first curve
+        :param range_1: start and end (exclusive) in the first curve
+        :param index_2: index of the second curve
+        :param range_2: start and end (exclusive) in the second curve
+        :return: correlation (float64), length of the longer part
+        """
+        start_1, start_2 = range_1[0], range_2[0]
+        length_1 = max(min(range_1[1], len(self.values[index_1])) - start_1, 0)
+        length_2 = max(min(range_2[1], len(self.values[index_2])) - start_2, 0)
+        length = min(length_1, length_2)
+        result = np.full(max(length_1, length_2), np.nan)
+        window = self.window
+        if window < 2 or length < window:
+            return result
+
+        products = self.values[index_1][start_1:start_1 + length] * self.values[index_2][start_2:start_2 + length]
+        sum_xy = correlation.rollingSums(products[np.newaxis, :], window)[0]
+        # windows of the curves are indexed by their first value
+        windows_1 = slice(start_1, start_1 + length - window + 1)
+        windows_2 = slice(start_2, start_2 + length - window + 1)
+        result[window - 1:length] = correlation.correlationFromSums(
+            self.sums[index_1][windows_1], self.sums[index_2][windows_2], sum_xy,
+            self.roots[index_1][windows_1], self.roots[index_2][windows_2], window,
+            self.missing[index_1][windows_1] | self.missing[index_2][windows_2],
+            self.constant[index_1][windows_1] | self.constant[index_2][windows_2])
+        return result
+
+
+def createBatch(data_points: List[data.DataPoint], bands: List[np.ndarray], pieces: List[Dict[tuple, np.ndarray]],
+                points_per_second: List[float], band_width: float) -> StationDayBatch:
+    """
+    :param data_points: DataPoints, one per station
+    :param bands: band curves of every DataPoint (see data.DataPoint.createBandCurves())
+    :param pieces: curves of the pieces of every DataPoint (see curves.bandPieces())
+    :param points_per_second: values per second of the curves of every DataPoint
+    :param band_width: MHz, of the bands
+    :return: StationDayBatch
+    """
+    lengths = np.array([i.shape[1] for i in bands], dtype=int)
+    # bands below the lowest frequency of all stations stay out
+    first_band = min([int(data.bandIndex([min(i.spectrum_data.freq_axis)], band_width)[0]) for i in data_points],
+                     default=0)
+    number_bands = max([i.shape[0] for i in bands], default=first_band) - first_band
+    values = np.full((len(bands), max(number_bands, 0), max(lengths, default=0)), np.nan)
+    for station, bands_ in enumerate(bands):
+        values[station, :bands_.shape[0] - first_band, :bands_.shape[1]] = bands_[first_band:]
+    valid = ~np.isnan(values).all(axis=1)
+    return StationDayBatch(values, valid, first_band, pieces, data_points, np.array(points_per_second, dtype=float),
+                           lengths)
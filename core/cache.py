@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - cache.py -
+
+decoded spectrum cache - keeps uncompressed, memory mappable copies of e-Callisto files that were already read,
+so loading the same file again costs a page-cache hit instead of a gzip decode and a fits parse
+low level
+"""
+
+import hashlib
+import json
+import os
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+from radiospectra.sources.callisto import CallistoSpectrogram, _parse_header_time
+
+import config
+
+ending_data = ".npy"
+ending_axes = ".npz"
+ending_header = ".json"
+entry_endings = [ending_data, ending_axes, ending_header]
+folder_curves = "curves"        # curve store (see curves.py), shares the size limit of the cache
+
+
+def cacheKey(file: str) -> str:
+    """
+    content address of a file in the cache, changes as soon as the file gets replaced or rewritten
+
+    :param file: path to the e-Callisto file
+    :return: key of the cache entry
+    """
+    stat = os.stat(file)
+    name = os.path.basename(file)
+    return hashlib.sha1(f"{name}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def pathEntry(key: str, ending: str) -> str:
+    """
+    :param key: key of the cache entry
+    :param ending: one of entry_endings
+    :return: path to the file of the cache entry
+    """
+    return os.path.join(config.path_cache, key + ending)
+
+
+def readSpectrogram(file: str) -> CallistoSpectrogram:
+    """
+    reads a spectrogram through the cache, decodes the file and adds it to the cache if it isn't cached yet
+
+    the data of cached spectrograms is memory mapped copy-on-write, changes to it never reach the cache
+
+    :param file: path to the e-Callisto file
+    :return: spectrogram
+    """
+    if not config.cache_spectra:
+        return decodeSpectrogram(file)
+
+    key = cacheKey(file)
+    try:
+        return loadEntry(key)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    spectrogram = decodeSpectrogram(file)
+    try:
+        storeEntry(key, spectrogram)
+    except OSError:
+        warnings.warn(message=f"could not cache {file}", category=UserWarning)
+    return spectrogram
+
+
+def isCached(file: str) -> bool:
+    """
+    :param file: path to the e-Callisto file
+    :return: whether readSpectrogram() gets the file from the cache instead of decoding it
+    """
+    if not config.cache_spectra:
+        return False
+    try:
+        # the header sidecar gets written last (see storeEntry())
+        return os.path.isfile(pathEntry(cacheKey(file), ending_header))
+    except OSError:
+        return False
+
+
+def decodeSpectrogram(file: str) -> CallistoSpectrogram:
+    """
+    reads an e-Callisto file like CallistoSpectrogram.read(), but corrects malformed end times (see normalizeHeader())
+    in memory, the file itself never gets changed
+
+    the statistic of the plausibility check gets computed here, while the data is in memory anyway, and is kept as
+    plausibility_count of the spectrogram (and in its cache entry)
+
+    :param file: path to the e-Callisto file
+    :return: spectrogram
+    """
+    with fits.open(file) as fl:
+        data = fl[0].data
+        axes = fl[1]
+        header = fl[0].header
+        normalizeHeader(header)
+
+        start = _parse_header_time(header["DATE-OBS"], header.get("TIME-OBS", header.get("TIME$_OBS")))
+        end = _parse_header_time(header["DATE-END"], header.get("TIME-END", header.get("TIME$_END")))
+
+        swapped = "time" not in header["CTYPE1"].lower()
+        if swapped:
+            t_delt = header["CDELT2"]
+            t_init = header["CRVAL2"] - t_delt * header["CRPIX2"]
+            t_label = header["CTYPE2"]
+            f_delt = header["CDELT1"]
+            f_init = header["CRVAL1"] - t_delt * header["CRPIX1"]
+            f_label = header["CTYPE1"]
+            data = data.transpose()
+        else:
+            t_delt = header["CDELT1"]
+            t_init = header["CRVAL1"] - t_delt * header["CRPIX1"]
+            t_label = header["CTYPE1"]
+            f_delt = header["CDELT2"]
+            f_init = header["CRVAL2"] - t_delt * header["CRPIX2"]
+            f_label = header["CTYPE2"]
+
+        try:
+            time_axis = np.squeeze(axes.data["time"])
+        except KeyError:
+            time_axis = np.linspace(0, data.shape[1] - 1) * t_delt + t_init
+        try:
+            freq_axis = np.squeeze(axes.data["frequency"])
+        except KeyError:
+            freq_axis = np.linspace(0, data.shape[0] - 1) * f_delt + f_init
+
+        spectrogram = CallistoSpectrogram(data, time_axis, freq_axis, start, end, t_init, t_delt, t_label, f_label,
+                                          header["CONTENT"], {header["INSTRUME"]}, header, axes.header, swapped)
+        spectrogram.plausibility_count = plausibilityCount(spectrogram)
+        return spectrogram
+
+
+def plausibilityCount(spectrogram: CallistoSpectrogram) -> int:
+    """
+    statistic of DataPoint.plausibleDataCheck(): number of values of the summed curve over all frequencies
+    (flattened like DataPoint.flattenSummedCurve()) above 98% of its maximum, saturated files have a lot of them
+
+    the statistic depends on the cleaned up spectrum, not on the raw file: only the frequencies that
+    DataPoint.cleanUpData() keeps and the number of values of DataPoint.readFile() are summed.
+    files that readFile() bins in time get counted before the binning
+
+    :param spectrogram: freshly decoded spectrogram
+    :return: number of values close to the maximum, number of values of the spectrum if nothing is left to sum up
+    """
+    freq_axis = spectrogram.freq_axis
+    number_values = min(spectrogram.data.shape[1], len(spectrogram.time_axis))
+    data = spectrogram.data[np.argmax(freq_axis):np.argmin(freq_axis) + 1, :number_values]
+    if not data.size:
+        return number_values
+
+    curve = np.ma.filled(np.nansum(data, axis=0, dtype=np.float64), np.nan)
+    mask = (curve < 0) & (np.abs(curve) > 2 * np.nanmax(curve))
+    curve[mask] = np.nanmedian(curve)
+    if number_values > 3 * config.LENGTH_FILES_MINUTES * 60 * config.DATA_POINTS_PER_SECOND:
+        curve = curve - pd.Series(curve).rolling(config.CURVE_FLATTEN_WINDOW).median().to_numpy()
+    else:
+        curve = curve - np.nanmedian(curve)
+    return int(np.count_nonzero(curve > np.nanmax(curve) * 0.98))
+
+
+def normalizeHeader(header: fits.Header) -> None:
+    """
+    some stations write the end time of files that end after midnight as 24:xx:xx of the previous day,
+    corrects DATE-END and TIME-END in place to 00:xx:xx of the next day
+
+    :param header: primary header of an e-Callisto file
+    """
+    date_end = header.get('DATE-END')
+    time_end = header.get('TIME-END')
+    if not isinstance(time_end, str) or not isinstance(date_end, str) or time_end[:2] != '24':
+        return
+    date_end_proper = datetime(int(date_end[:4]), int(date_end[5:7]), int(date_end[8:10])) + timedelta(days=1)
+    header['DATE-END'] = date_end_proper.strftime("%Y/%m/%d")
+    header['TIME-END'] = '00' + time_end[2:]
+
+
+def loadEntry(key: str) -> CallistoSpectrogram:
+    """
+    loads a spectrogram from the cache, raises FileNotFoundError if there is no such entry
+
+    :param key: key of the cache entry
+    :return: spectrogram with memory mapped data and the plausibility_count of decodeSpectrogram()
+    """
+    path_header = pathEntry(key, ending_header)
+    with open(path_header, "r") as file:
+        params = json.load(file)
+    data = np.load(pathEntry(key, ending_data), mmap_mode='c')
+    with np.load(pathEntry(key, ending_axes)) as axes:
+        time_axis = axes["time_axis"]
+        freq_axis = axes["freq_axis"]
+    os.utime(path_header)
+
+    spectrogram = CallistoSpectrogram(data, time_axis, freq_axis,
+                                      datetime.fromisoformat(params["start"]),
+                                      datetime.fromisoformat(params["end"]),
+                                      params["t_init"], params["t_delt"], params["t_label"], params["f_label"],
+                                      params["content"], set(params["instruments"]),
+                                      fits.Header.fromstring(params["header"]),
+                                      fits.Header.fromstring(params["axes_header"]),
+                                      params["swapped"])
+    spectrogram.plausibility_count = params["plausibility_count"]
+    return spectrogram
+
+
+def storeEntry(key: str, spectrogram: CallistoSpectrogram) -> None:
+    """
+    writes a spectrogram to the cache, the header sidecar gets written last, so half written entries are never read
+
+    :param key: key of the cache entry
+    :param spectrogram: freshly read spectrogram
+    """
+    os.makedirs(config.path_cache, exist_ok=True)
+    params = {"start": spectrogram.start.isoformat(),
+              "end": spectrogram.end.isoformat(),
+              "t_init": float(spectrogram.t_init),
+              "t_delt": float(spectrogram.t_delt),
+              "t_label": spectrogram.t_label,
+              "f_label": spectrogram.f_label,
+              "content": spectrogram.content,
+              "instruments": sorted(spectrogram.instruments),
+              "header": spectrogram.header.tostring(),
+              "axes_header": spectrogram.axes_header.tostring(),
+              "swapped": bool(spectrogram.swapped),
+              "plausibility_count": int(spectrogram.plausibility_count)}
+
+    suffix = f".{os.getpid()}.tmp"
+    with open(pathEntry(key, ending_data) + suffix, "wb") as file:
+        np.save(file, np.ascontiguousarray(spectrogram.data))
+    with open(pathEntry(key, ending_axes) + suffix, "wb") as file:
+        np.savez(file, time_axis=spectrogram.time_axis, freq_axis=spectrogram.freq_axis)
+    with open(pathEntry(key, ending_header) + suffix, "w") as file:
+        json.dump(params, file)
+    for ending in entry_endings:
+        os.replace(pathEntry(key, ending) + suffix, pathEntry(key, ending))
+
+    addedSize(sum(os.path.getsize(pathEntry(key, ending)) for ending in entry_endings))
+
+
+def addedSize(size: int) -> None:
+    """
+    counts new files of the cache or of the curve store, evicts least recently used ones above
+    config.cache_size_limit
+
+    :param size: in bytes
+    """
+    if storeEntry.size is not None:
+        storeEntry.size += size
+    if storeEntry.size is None or storeEntry.size > config.cache_size_limit:
+        storeEntry.size = evict()
+
+
+storeEntry.size = None
+
+
+def evict(size_limit: int or None = None) -> int:
+    """
+    removes least recently used entries until the cache is smaller than size_limit, files of the curve store count
+    as entries too
+
+    :param size_limit: in bytes, default: config.cache_size_limit
+    :return: size of the cache in bytes after eviction
+    """
+    if size_limit is None:
+        size_limit = config.cache_size_limit
+    if not os.path.isdir(config.path_cache):
+        return 0
+
+    entries = []
+    for file in os.listdir(config.path_cache):
+        if not file.endswith(ending_header):
+            continue
+        key = file[:-len(ending_header)]
+        try:
+            last_used = os.path.getmtime(pathEntry(key, ending_header))
+            size = sum(os.path.getsize(pathEntry(key, ending)) for ending in entry_endings)
+        except OSError:
+            continue
+        # the header sidecar gets removed last
+        entries.append([last_used, size, [pathEntry(key, ending) for ending in reversed(entry_endings)]])
+
+    path_curves = os.path.join(config.path_cache, folder_curves)
+    if os.path.isdir(path_curves):
+        for file in os.listdir(path_curves):
+            if file.endswith(".tmp"):
+                continue
+            path = os.path.join(path_curves, file)
+            try:
+                entries.append([os.path.getmtime(path), os.path.getsize(path), [path]])
+            except OSError:
+                continue
+
+    size_cache = sum(i[1] for i in entries)
+    for last_used, size, paths in sorted(entries):
+        if size_cache <= size_limit:
+            break
+        try:
+            for path in paths:
+                os.remove(path)
+            size_cache -= size
+        except OSError:
+            # still mapped by some process (windows)
+            continue
+    return size_cache
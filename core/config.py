@@ -127,11 +127,46 @@ file_type_zip = ".fit.gz"
 file_ending = file_type_zip
 e_callisto_url = 'http://soleil.i4ds.ch/solarradio/data/2002-20yy_Callisto/'
 
+# decoded spectrum cache (see cache.py)
+path_cache = os.path.join(path_data, "cache")
+cache_spectra = True
+cache_size_limit = 20 * 1024 ** 3       # bytes, least recently used entries get removed above this size
+
+# parallel loading of spectra (see loader.py), 0 or 1: everything gets loaded in the main process
+# off by default: only decoding files that aren't cached yet can gain, cached files are loaded in the main process
+# anyway, the speed-up of the pool is unverified (only measured on a single core), measure before turning it on
+# (e.g. os.cpu_count())
+load_workers = 0
+
+# storage precision of derived spectra (background subtracted, binned), raw spectra stay uint8 until then
+# "float64": full precision, twice the memory
+spectrum_dtype = "float32"
+
+# DataPoints cut out of a day or of loaded files (events of step 2 and 3) subtract the background of the whole
+# spectrum instead of estimating it from the few minutes of the cut (see data.DataPoint.backgroundProfile())
+# off by default: a constant background over a whole day doesn't fit the cut well enough, bursts get lost in step 3
+background_from_parent = False
+
+# summed curves of the standard bands of every station of step 1 and the DataPoints of the day get stored in
+# path_cache, within cache_size_limit (see curves.py), later runs with the same curve parameters (e.g. other limits,
+# rolling or flatten windows) can skip loading the spectra
+# the curve of the common frequency range of a pair is the sum of the bands and of the parts of the bands at its edges,
+# same events as without the store
+curve_store = True
+curve_band_width = 10.      # MHz, standard bands [k * curve_band_width, (k + 1) * curve_band_width)
+
+# step 1 correlates all pairs of stations at once (see analysis.calcPairs()), same events as pair by pair
+batch_correlation = True
+
+# derived spectra and curves kept in memory for reuse (see data.getDerived())
+derived_size_limit = 2 * 1024 ** 3      # bytes, least recently used products get removed above this size
+
 # default values for e-Callisto files
 DATA_POINTS_PER_SECOND = 4
 LENGTH_FILES_MINUTES = 15
 BIN_FACTOR = 4
 ROLL_WINDOW = 180
+CURVE_FLATTEN_WINDOW = 100
 
 # time format for output files
 event_time_format = "%H:%M:%S"
@@ -10,8 +10,8 @@ Contains correlation method
 
 import copy
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
+from typing import List
 
 import events
 import data
@@ -30,6 +30,7 @@ BURST_TYPE_UNKNOWN = events.BURST_TYPE_UNKNOWN          # TODO
 default_time_window = config.BIN_FACTOR
 default_flatten_window = 2000
 default_r_window = config.ROLL_WINDOW
+window_block = 1024      # values per block of the prefix sums in rollingSums()
 
 
 class Correlation:
@@ -39,7 +40,8 @@ class Correlation:
                  flatten_window=default_flatten_window,
                  r_window=default_r_window,
                  method_bin_t='median',
-                 method_bin_f='median'):
+                 method_bin_f='median',
+                 curves=None):
         """
         Calculates correlation curve for two datapoints
         :param data_point_1:
@@ -54,9 +56,11 @@ class Correlation:
         :param r_window:
         :param method_bin_t:
         :param method_bin_f:
+        :param curves: optional, summed curves of both DataPoints after processing (see curves.py),
+            the spectra don't get processed then
         """
-        self.data_point_1 = copy.deepcopy(data_point_1)
-        self.data_point_2 = copy.deepcopy(data_point_2)
+        self.data_point_1 = copy.copy(data_point_1)
+        self.data_point_2 = copy.copy(data_point_2)
 
         self.data_per_second_1 = data_point_1.points_per_second
         self.data_per_second_2 = data_point_2.points_per_second
@@ -98,86 +102,47 @@ class Correlation:
                                 DATA_POINTS_PER_SECOND / self.bin_time_width][self.bin_time]
 
         self.setupFreqRange()
-        self.modulateData()
-        self.setupSummedCurves()
+        self.modulateData(process=curves is None)
+        if curves is None:
+            self.setupSummedCurves()
+        else:
+            self.data_point_1.summed_curve, self.data_point_2.summed_curve = curves
         self.correlateCurves()
         self.calculateTimeAxis()
 
     def correlateCurves(self):
-        delta_t_start = (self.data_point_1.spectrum_data.start - self.data_point_2.spectrum_data.start).total_seconds()
-        delta_t_end = (self.data_point_1.spectrum_data.end - self.data_point_2.spectrum_data.end).total_seconds()
-
-        curve1 = self.data_point_1.summed_curve
-        curve2 = self.data_point_2.summed_curve
-
-        if delta_t_start and self.data_point_1.spectrum_data.start < self.data_point_2.spectrum_data.start:
-            curve1 = curve1[int(self.data_per_second_1 * abs(delta_t_start)):]
-        elif delta_t_start and self.data_point_1.spectrum_data.start > self.data_point_2.spectrum_data.start:
-            curve2 = curve2[int(self.data_per_second_2 * abs(delta_t_start)):]
-
-        if delta_t_end and self.data_point_1.spectrum_data.end > self.data_point_2.spectrum_data.end and \
-                int(self.data_per_second_1 * abs(delta_t_end)):
-            curve1 = curve1[:-int(self.data_per_second_1 * abs(delta_t_end))]
-        elif delta_t_end and self.data_point_1.spectrum_data.end < self.data_point_2.spectrum_data.end and \
-                int(self.data_per_second_2 * abs(delta_t_end)) > 0:
-            curve2 = curve2[:-int(self.data_per_second_2 * abs(delta_t_end))]
-
-        if self.data_per_second_1 < self.data_per_second_2:
-            curve1 = np.array([curve1[int(i / (self.data_per_second_2 / self.data_per_second_1))] for i in
-                               range(int(self.data_per_second_2 / self.data_per_second_1 * len(curve1)))])
-        if self.data_per_second_1 > self.data_per_second_2:
-            curve2 = np.array([curve2[int(i / (self.data_per_second_1 / self.data_per_second_2))] for i in
-                               range(int(self.data_per_second_1 / self.data_per_second_2 * len(curve2)))])
-
-        self.data_curve = pd.Series(curve1).rolling(self.r_window).corr(pd.Series(curve2))\
-                            .replace([np.inf, -np.inf], np.nan).tolist()
+        offset_1, curve1 = data.curveOnGrid(self.data_point_1.summed_curve,
+                                            self.data_point_1.spectrum_data.start.timestamp(),
+                                            self.data_per_second_1, self.data_per_second)
+        offset_2, curve2 = data.curveOnGrid(self.data_point_2.summed_curve,
+                                            self.data_point_2.spectrum_data.start.timestamp(),
+                                            self.data_per_second_2, self.data_per_second)
+        (start_1, end_1), (start_2, end_2) = gridRanges(offset_1, len(curve1), offset_2, len(curve2))
+        self.time_start = max(offset_1, offset_2) / self.data_per_second
+        self.data_curve = rollingCorrelation(curve1[start_1:end_1], curve2[start_2:end_2], self.r_window)
 
     def calculatePeaks(self, limit=CORRELATION_MIN):
-        within_burst = False
-        high_correlation = False
-        peaks = []
         if self.data_point_1.observatory == self.data_point_2.observatory:
             return
-        time_start = datetime.fromtimestamp(self.time_start)
-        for point in range(len(self.data_curve)):
-            if self.data_curve[point] > config.correlation_start and not within_burst and not high_correlation:
-                time_start = datetime.fromtimestamp(point / self.data_per_second + self.time_start)
-                high_correlation = True
-
-            if self.data_curve[point] > limit and not within_burst:
-                burst = events.Event(time_start, probability=self.data_curve[point],
-                                     stations=[self.data_point_1.observatory, self.data_point_2.observatory])
-                if burst.time_start.day == self.day:
-                    peaks.append(burst)
-                    within_burst = True
-
-            if self.data_curve[point] > limit and within_burst and self.data_curve[point] > peaks[-1].probability:
-                peaks[-1].probability = self.data_curve[point]
-            if within_burst and self.data_curve[point] < CORRELATION_PEAK_END:
-                time_end = datetime.fromtimestamp(point / self.data_per_second + self.time_start)
-                peaks[-1].setTimeEnd(time_end)
-
-                # TODO better differentiation
-                if (peaks[-1].time_end - peaks[-1].time_start).total_seconds() <\
-                        timedelta(seconds=LENGTH_TYPE_III_AVG).total_seconds():
-                    peaks[-1].burst_type = TYPE_III
-                else:
-                    peaks[-1].burst_type = TYPE_UNKNOWN
-                within_burst = False
-            if self.data_curve[point] < config.correlation_start:
-                high_correlation = False
-
+        peaks = findPeaks(self.data_curve, self.time_start, self.data_per_second, self.day,
+                          [self.data_point_1.observatory, self.data_point_2.observatory], limit=limit)
         if peaks:
-            if peaks[-1].burst_type == BURST_TYPE_UNKNOWN:  # TODO
-                if peaks[-1].probability == np.around(1, 5):
-                    peaks.pop(-1)
-                else:
-                    peaks[-1].burst_type = TYPE_III
-            for peak in peaks:
-                if np.isinf(peak.probability):
-                    peaks.remove(peak)
             self.peaks = events.EventList(peaks, self.date)
 
+    def peaksLimits(self, limits: List[float]) -> List[events.EventList]:
+        """
+        bursts for several limits from one pass over the correlation curve (see findPeaksLimits()),
+        e.g. to try different limits without correlating again, self.peaks doesn't change
+
+        :param limits: min correlations required to recognise a burst
+        :return: EventList per limit, in the order of limits
+        """
+        if self.data_point_1.observatory == self.data_point_2.observatory:
+            return [events.EventList([], self.date) for _ in limits]
+        peaks = findPeaksLimits(self.data_curve, self.time_start, self.data_per_second, self.day,
+                                [self.data_point_1.observatory, self.data_point_2.observatory], limits)
+        return [events.EventList(i, self.date) for i in peaks]
+
     def fileName(self):
         # TODO time of day ??
         background = ['', '_nobg'][self.no_background]
@@ -230,8 +195,7 @@ class Correlation:
         self.frequency_range = [frequency_low, frequency_high]
 
     def calculateTimeAxis(self):
-        data_per_second = max(self.data_per_second_1, self.data_per_second_2)
-        self.time_axis = [i / data_per_second for i in range(len(self.data_curve))]
+        self.time_axis = np.arange(len(self.data_curve)) / self.data_per_second
 
     def setupSummedCurves(self):
         setupSummedCurve(self.data_point_1, self.frequency_range, self.flatten, self.flatten_window)
@@ -241,24 +205,21 @@ class Correlation:
         return data.plotCurve(self.time_axis, self.data_curve, self.time_start,
                               ax, peaks=peaks, new_ax=False, label=label, color=color)
 
-    def modulateData(self):
-        self.data_per_second_1 = np.round(self.data_point_1.number_values /
-                                          (self.data_point_1.spectrum_data.end - self.data_point_1.spectrum_data.start)
-                                          .total_seconds(), 2)
-        self.data_per_second_2 = np.round(self.data_point_2.number_values /
-                                          (self.data_point_2.spectrum_data.end - self.data_point_2.spectrum_data.start)
-                                          .total_seconds(), 2)
+    def modulateData(self, process=True):
+        self.data_per_second_1 = self.data_point_1.dataPerSecond()
+        self.data_per_second_2 = self.data_point_2.dataPerSecond()
 
-        if self.no_background:
+        if self.no_background and process:
             self.data_point_1.subtractBackground()
             self.data_point_2.subtractBackground()
         if self.bin_time:
-            self.data_point_1.binDataTime(width=self.bin_time_width, method=self.method_bin_t)
-            self.data_point_2.binDataTime(width=self.bin_time_width, method=self.method_bin_t)
+            if process:
+                self.data_point_1.binDataTime(width=self.bin_time_width, method=self.method_bin_t)
+                self.data_point_2.binDataTime(width=self.bin_time_width, method=self.method_bin_t)
             self.data_per_second_1 = self.data_per_second_1 / self.bin_time_width
             self.data_per_second_2 = self.data_per_second_2 / self.bin_time_width
             self.time_axis = np.arange(self.time_start, self.time_end, self.bin_time_width / self.data_per_second)
-        if self.bin_frequency:
+        if self.bin_frequency and process:
             self.data_point_1.binDataFreq(method=self.method_bin_f)
             self.data_point_2.binDataFreq(method=self.method_bin_f)
 
@@ -267,3 +228,235 @@ def setupSummedCurve(data_point: data.DataPoint, frequency_range, flatten: bool,
     data_point.createSummedCurve(frequency_range)
     if flatten:
         data_point.flattenSummedCurve(flatten_window)
+
+
+def gridRanges(offset_1: int, length_1: int, offset_2: int, length_2: int) -> ((int, int), (int, int)):
+    """
+    parts of two curves on the canonical time grid (see data.gridIndices()) that overlap in time
+
+    :param offset_1: index of the first point of the grid of the first curve
+    :param length_1: length of the first curve
+    :param offset_2: index of the first point of the grid of the second curve
+    :param length_2: length of the second curve
+    :return: start and end (exclusive) in both curves
+    """
+    start = max(offset_1, offset_2)
+    end = max(min(offset_1 + length_1, offset_2 + length_2), start)
+    return (start - offset_1, end - offset_1), (start - offset_2, end - offset_2)
+
+
+def findPeaks(data_curve, time_start: float, data_per_second: float, day: int, stations: list,
+              limit: float = CORRELATION_MIN) -> List[events.Event]:
+    """
+    bursts in a correlation curve: from where it rises above config.correlation_start, if it gets above limit,
+    until it falls below CORRELATION_PEAK_END, with the highest correlation as probability
+
+    :param data_curve: correlation curve
+    :param time_start: timestamp of the first value of the curve
+    :param data_per_second: values per second of the curve
+    :param day: only bursts that start at this day of the month
+    :param stations: stations of the curve
+    :param limit: min correlation of a burst
+    :return: bursts
+    """
+    return findPeaksLimits(data_curve, time_start, data_per_second, day, stations, [limit])[0]
+
+
+def findPeaksLimits(data_curve, time_start: float, data_per_second: float, day: int, stations: list,
+                    limits: List[float]) -> List[List[events.Event]]:
+    """
+    findPeaks() for several limits at once: the rises, falls and values of the curve get prepared once,
+    only the bursts get put together per limit
+
+    :param limits: min correlations of a burst
+    :return: bursts per limit, in the order of limits
+    """
+    curve = np.asarray(data_curve, dtype=float)
+    length = len(curve)
+    if not len(limits):
+        return []
+    candidates = np.flatnonzero(curve > min(limits))
+    ends = np.flatnonzero(curve < CORRELATION_PEAK_END)
+    # rises above config.correlation_start, values that are neither above nor below (nan) don't change the state
+    above_start = curve > config.correlation_start
+    changes = np.flatnonzero(above_start | (curve < config.correlation_start))
+    crossings = changes[np.diff(above_start[changes].astype(np.int8), prepend=0) == 1]
+    values = np.append(np.where(np.isnan(curve), -np.inf, curve), -np.inf)
+
+    def peaksAbove(limit: float) -> List[events.Event]:
+        exceeds = candidates[curve[candidates] > limit]
+
+        # bursts one after the other, a burst starts at the last rise before its first value above limit
+        # (CORRELATION_PEAK_END < config.correlation_start: there is no rise left over after a burst ended)
+        bursts = []
+        time_burst = datetime.fromtimestamp(time_start)
+        position = 0
+        while position < length:
+            number = np.searchsorted(exceeds, position)
+            if number == len(exceeds):
+                break
+            first = exceeds[number]
+            number = np.searchsorted(crossings, first, side='right')
+            if number and crossings[number - 1] >= position:
+                time_burst = datetime.fromtimestamp(crossings[number - 1] / data_per_second + time_start)
+            if time_burst.day != day:
+                # no burst until the next rise
+                if number == len(crossings):
+                    break
+                position = crossings[number]
+                continue
+            number = np.searchsorted(ends, first)
+            last = ends[number] if number < len(ends) else None
+            bursts.append((time_burst, first, last))
+            if last is None:
+                break
+            position = last + 1
+        if not bursts:
+            return []
+
+        # highest value of every burst, from its first value above limit up to its end
+        bounds = np.array([[first, length if last is None else last + 1] for _, first, last in bursts]).ravel()
+        probabilities = np.maximum.reduceat(values, bounds)[::2]
+
+        peaks = []
+        for (time_burst, first, last), probability in zip(bursts, probabilities.tolist()):
+            peak = events.Event(time_burst, probability=probability, stations=list(stations))
+            if last is not None:
+                peak.setTimeEnd(datetime.fromtimestamp(last / data_per_second + time_start))
+                # TODO better differentiation
+                if (peak.time_end - peak.time_start).total_seconds() < \
+                        timedelta(seconds=LENGTH_TYPE_III_AVG).total_seconds():
+                    peak.burst_type = TYPE_III
+                else:
+                    peak.burst_type = TYPE_UNKNOWN
+            peaks.append(peak)
+
+        if peaks[-1].burst_type == BURST_TYPE_UNKNOWN:  # TODO
+            if peaks[-1].probability == np.around(1, 5):
+                peaks.pop(-1)
+            else:
+                peaks[-1].burst_type = TYPE_III
+        return [peak for peak in peaks if not np.isinf(peak.probability)]
+
+    return [peaksAbove(limit) for limit in limits]
+
+
+def rollingCorrelation(curve_1, curve_2, window: int) -> np.ndarray:
+    """
+    rolling pearson correlation of two curves over window values, ending at each value,
+    like pd.Series(curve_1).rolling(window).corr(pd.Series(curve_2)) with inf replaced by nan
+
+    windows with a missing value (nan, inf or masked) in one of the curves are nan, the shorter curve gets padded
+    with nan. windows in which one of the curves is constant are nan, like in pandas without rounding errors (pandas
+    can also give 0, rounding noise or inf there, depending on the values before the window).
+    the sums come from rollingSums(), the result differs from pandas by less than 1e-4 for windows of
+    config.ROLL_WINDOW values, mostly by rounding of pandas (about 1e-10 on summed curves of a day)
+
+    :param curve_1: curve
+    :param curve_2: curve
+    :param window: number of values
+    :return: correlation (float64), length of the longer curve
+    """
+    length = max(len(curve_1), len(curve_2))
+    result = np.full(length, np.nan)
+    if window < 2 or window > length:
+        return result
+
+    values = np.empty((5, length))
+    x, y, xx, yy, xy = values
+    for row, curve in [(x, curve_1), (y, curve_2)]:
+        row[:len(curve)] = np.ma.filled(curve, np.nan) if np.ma.isMaskedArray(curve) else curve
+        row[len(curve):] = np.nan
+    valid = np.isfinite(x) & np.isfinite(y)
+    x[~valid] = 0
+    y[~valid] = 0
+    # windows with missing values or without a change, counted exactly
+    missing = countWindows(~valid, window)
+    constant = (countWindows(x[1:] != x[:-1], window - 1) == 0) | (countWindows(y[1:] != y[:-1], window - 1) == 0)
+    # the correlation doesn't change with an offset, centering keeps the sums of squares small
+    number_valid = max(np.count_nonzero(valid), 1)
+    x -= np.sum(x) / number_valid * valid
+    y -= np.sum(y) / number_valid * valid
+    np.multiply(x, x, out=xx)
+    np.multiply(y, y, out=yy)
+    np.multiply(x, y, out=xy)
+
+    sum_x, sum_y, sum_xx, sum_yy, sum_xy = rollingSums(values, window)
+    result[window - 1:] = correlationFromSums(sum_x, sum_y, sum_xy, deviationRoots(sum_x, sum_xx, window),
+                                              deviationRoots(sum_y, sum_yy, window), window, missing > 0, constant)
+    return result
+
+
+def deviationRoots(sum_x: np.ndarray, sum_xx: np.ndarray, window: int) -> np.ndarray:
+    """
+    :param sum_x: sums of x over windows
+    :param sum_xx: sums of x * x over the same windows
+    :param window: number of values per window
+    :return: square roots of the sums of squared deviations from the mean of the windows
+    """
+    return np.sqrt(np.maximum(sum_xx - sum_x * sum_x / window, 0))
+
+
+def correlationFromSums(sum_x: np.ndarray, sum_y: np.ndarray, sum_xy: np.ndarray, root_x: np.ndarray,
+                        root_y: np.ndarray, window: int, missing: np.ndarray, constant: np.ndarray) -> np.ndarray:
+    """
+    pearson correlation of windows from their sums (see rollingCorrelation())
+
+    :param sum_x: sums of x
+    :param sum_y: sums of y
+    :param sum_xy: sums of x * y, gets overwritten by the correlation
+    :param root_x: see deviationRoots()
+    :param root_y: see deviationRoots()
+    :param window: number of values per window
+    :param missing: windows with missing values, nan
+    :param constant: windows in which x or y is constant, nan (no variance)
+    :return: correlation
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_xy -= sum_x * sum_y / window
+        correlation = np.divide(sum_xy, root_x * root_y, out=sum_xy)
+    np.clip(correlation, -1, 1, out=correlation)
+    correlation[missing | constant | ~np.isfinite(correlation)] = np.nan
+    return correlation
+
+
+def countWindows(flags: np.ndarray, window: int) -> np.ndarray:
+    """
+    :param flags: bool array
+    :param window: number of values
+    :return: number of set flags in each window of window values, the first window first
+    """
+    counts = np.zeros(len(flags) + 1, dtype=np.int64)
+    np.cumsum(flags, out=counts[1:])
+    return counts[window:] - counts[:len(counts) - window]
+
+
+def rollingSums(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    sums over window values along the last axis, from prefix sums which restart every block of
+    (at least window_block) values: a window spans at most two blocks, so the rounding error stays
+    at the scale of a block instead of growing with the length of the day
+
+    :param values: values (n, length)
+    :param window: number of values, at most length
+    :return: sums (n, length - window + 1), the sum over the first window values first
+    """
+    number, length = values.shape
+    block = max(window_block, window)
+    blocks = -(-length // block)
+    # one more block, the windows starting in the last block end there
+    prefix = np.zeros((number, blocks + 1, block))
+    prefix.reshape(number, -1)[:, :length] = values
+    np.cumsum(prefix, axis=2, out=prefix)
+    flat = prefix.reshape(number, -1)
+
+    # sum of a window: prefix at its end minus prefix before its start, within the same block
+    sums = np.empty((number, blocks * block))
+    sums[:, 0] = flat[:, window - 1]
+    np.subtract(flat[:, window:window - 1 + blocks * block], flat[:, :blocks * block - 1], out=sums[:, 1:])
+    sums = sums.reshape(number, blocks, block)
+    # windows at the start of a block: the prefix before them belongs to the block before
+    sums[:, 1:, 0] += prefix[:, :blocks - 1, -1]
+    # windows crossing into the next block: rest of their first block
+    sums[:, :, block - window + 1:] += prefix[:, :blocks, -1:]
+    return sums.reshape(number, -1)[:, :length - window + 1]
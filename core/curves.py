@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - curves.py -
+
+persistent store of the summed curves of the standard frequency bands of whole station days (see
+data.DataPoint.createBandCurves()), one memory mappable file per station day, keyed by the files of the station day
+and the processing parameters, in the decoded spectrum cache and under its size limit, with the DataPoints of a day
+without their spectra, so step 1 can run from the curves alone.
+the summed curve of the common frequency range of a pair is the sum of the bands inside the range and of the parts of
+the bands at its edges (see bandPieces()), the parts get stored as one file each, same channels as without the store
+low level
+"""
+
+import copy
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import warnings
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+import cache
+import config
+import data
+import manifest
+
+folder_curves = cache.folder_curves
+ending_curve = ".npy"
+ending_data_sets = ".pkl"
+
+
+def pathCurves(name: str) -> str:
+    """
+    :param name: file name
+    :return: path of the file in the curve store
+    """
+    return os.path.join(config.path_cache, folder_curves, name)
+
+
+def parameters(mask_frq: bool, limit_frq: float, no_bg: bool, bin_time: bool, bin_time_width: int, method_bin_t: str,
+               bin_freq: bool, method_bin_f: str) -> dict:
+    """
+    processing parameters of the band curves (see analysis.calcPoint()), parameters of switched off steps are dropped,
+    flattening happens after the bands of a pair are summed up
+
+    :return: parameters
+    """
+    return {"mask_frq": [bool(mask_frq), float(limit_frq) if mask_frq else None],
+            "no_bg": bool(no_bg),
+            "bin_time": [bool(bin_time), int(bin_time_width) if bin_time else None, method_bin_t if bin_time else None],
+            "bin_freq": [bool(bin_freq), method_bin_f if bin_freq else None],
+            "spectrum_dtype": str(np.dtype(config.spectrum_dtype)),
+            "band_width": float(config.curve_band_width)}
+
+
+def sourceKey(data_point: data.DataPoint) -> str:
+    """
+    content address of the spectrum of a DataPoint, changes as soon as one of its files gets replaced,
+    stays the same as long as the spectrum isn't processed
+
+    :param data_point: DataPoint
+    :return: key
+    """
+    if data_point.source_key is None:
+        spectrum = data_point.spectrum_data
+        source = {"files": [cache.cacheKey(file) for file in data_point.source_files],
+                  "start": spectrum.start.isoformat(),
+                  "end": spectrum.end.isoformat(),
+                  "number_values": int(data_point.number_values),
+                  "debug": bool(data_point.debug)}
+        data_point.source_key = hashlib.sha1(json.dumps(source).encode()).hexdigest()
+    return data_point.source_key
+
+
+def frequencyRange(data_point_1: data.DataPoint, data_point_2: data.DataPoint) -> List[float]:
+    """
+    :param data_point_1: unprocessed DataPoint
+    :param data_point_2: unprocessed DataPoint
+    :return: common frequency range of both (see correlation.Correlation.setupFreqRange())
+    """
+    frequency_low = max(data_point_1.spectrum_data.freq_axis[-1], data_point_2.spectrum_data.freq_axis[-1])
+    frequency_high = min(data_point_1.spectrum_data.freq_axis[0], data_point_2.spectrum_data.freq_axis[0])
+    return [float(frequency_low), float(frequency_high)]
+
+
+def bandPieces(frequency_range: List[float]) -> List[Tuple[int, Union[float, None], Union[float, None]]]:
+    """
+    standard bands (see config.curve_band_width) that make up a frequency range: the summed curve of the range is the
+    sum of the curves of its pieces
+
+    :param frequency_range: lower and upper frequency
+    :return: band and the limits of the range in it (lower and upper frequency, None where the range goes on beyond
+        the band) for every piece, see data.DataPoint.bandCurve()
+    """
+    first, last = data.bandIndex(frequency_range, config.curve_band_width)
+    return [(int(k), float(frequency_range[0]) if k == first else None,
+             float(frequency_range[1]) if k == last else None) for k in range(first, last + 1)]
+
+
+def fullBand(piece: Tuple[int, Union[float, None], Union[float, None]]) -> bool:
+    """
+    :param piece: see bandPieces()
+    :return: whether the piece is the whole band, a row of the band curves then
+    """
+    return piece[1] is None and piece[2] is None
+
+
+def bandsKey(data_point: data.DataPoint, parameters_: dict) -> str:
+    """
+    :param data_point: unprocessed DataPoint
+    :param parameters_: see parameters()
+    :return: key of the band curves of the DataPoint
+    """
+    bands = {"source": sourceKey(data_point),
+             "parameters": parameters_}
+    return hashlib.sha1(json.dumps(bands, sort_keys=True).encode()).hexdigest()
+
+
+def pieceKey(data_point: data.DataPoint, parameters_: dict,
+             piece: Tuple[int, Union[float, None], Union[float, None]]) -> str:
+    """
+    :param data_point: unprocessed DataPoint
+    :param parameters_: see parameters()
+    :param piece: part of a band (see bandPieces())
+    :return: key of the summed curve of the piece
+    """
+    curve = {"source": sourceKey(data_point),
+             "parameters": parameters_,
+             "piece": list(piece)}
+    return hashlib.sha1(json.dumps(curve, sort_keys=True).encode()).hexdigest()
+
+
+def loadCurves(key: str) -> Union[np.ndarray, None]:
+    """
+    :param key: see bandsKey() and pieceKey()
+    :return: memory mapped (read only) band curves or curve of a piece, None if they aren't stored
+    """
+    path = pathCurves(key + ending_curve)
+    try:
+        bands = np.load(path, mmap_mode='r')
+        # last use, for the eviction of the cache (see cache.evict())
+        os.utime(path)
+        return bands
+    except (OSError, ValueError):
+        return None
+
+
+def storeCurves(key: str, curves: np.ndarray) -> None:
+    """
+    :param key: see bandsKey() and pieceKey()
+    :param curves: band curves (see data.DataPoint.createBandCurves()) or curve of a piece
+    """
+    try:
+        os.makedirs(pathCurves(""), exist_ok=True)
+        path = pathCurves(key + ending_curve)
+        if os.path.isfile(path):
+            return
+        with open(path + f".{os.getpid()}.tmp", "wb") as file:
+            np.save(file, np.asarray(curves))
+        os.replace(path + f".{os.getpid()}.tmp", path)
+        cache.addedSize(os.path.getsize(path))
+    except OSError:
+        warnings.warn(message="could not store band curves", category=UserWarning)
+
+
+def rangeCurve(bands: np.ndarray, pieces: Dict[Tuple[int, Union[float, None], Union[float, None]], np.ndarray],
+               frequency_range: List[float], first_band: int = 0) -> Union[np.ndarray, None]:
+    """
+    summed curve of a frequency range from the band curves and the pieces at its edges (see bandPieces())
+
+    :param bands: band curves (see data.DataPoint.createBandCurves())
+    :param pieces: curves of pieces that aren't whole bands
+    :param frequency_range: lower and upper frequency
+    :param first_band: band of the first row of bands
+    :return: summed curve (see sumCurves()), None if a piece is missing
+    """
+    curves = []
+    for piece in bandPieces(frequency_range):
+        row = piece[0] - first_band
+        if fullBand(piece):
+            curves.append(bands[row] if 0 <= row < len(bands) else np.full(bands.shape[1], np.nan))
+        elif piece in pieces:
+            curves.append(pieces[piece])
+        else:
+            return None
+    return sumCurves(curves)
+
+
+def sumCurves(curves: List[np.ndarray]) -> np.ndarray:
+    """
+    summed curve of a frequency range from the curves of its pieces (see bandPieces()), like
+    data.DataPoint.createSummedCurve() over the channels of all of them
+
+    :param curves: curves of the pieces
+    :return: summed curve, nan where all pieces are nan
+    """
+    curves = np.asarray(curves)
+    curve = np.nansum(curves, axis=0)
+    curve[np.isnan(curves).all(axis=0)] = np.nan
+    return curve
+
+
+def dayKey(date: datetime.datetime, eu_ut: bool) -> str:
+    """
+    fingerprint of the day folders the DataPoints of a day come from (see steps.dataSetDay()), changes as soon as a
+    file gets added, removed or replaced
+
+    :param date: day
+    :param eu_ut: see steps.dataSetDay()
+    :return: key
+    """
+    days = [date] if eu_ut else [date - datetime.timedelta(days=1), date, date + datetime.timedelta(days=1)]
+    folders = []
+    for day in days:
+        try:
+            manifest_ = manifest.getManifest(day)
+            folders.append([manifest_.path, manifest_.mtime, manifest_.entries])
+        except OSError:
+            folders.append(None)
+    return hashlib.sha1(json.dumps([folders, str(np.dtype(config.spectrum_dtype))]).encode()).hexdigest()
+
+
+def nameDataSets(date: datetime.datetime, eu_ut: bool) -> str:
+    """
+    :param date: day
+    :param eu_ut: see steps.dataSetDay()
+    :return: file name of the DataPoints of a day
+    """
+    return f"{date.year}_{date.month:02}_{date.day:02}{['', '_eu_ut'][eu_ut]}{ending_data_sets}"
+
+
+def storeDataSets(date: datetime.datetime, eu_ut: bool, data_sets: List[data.DataPoint]) -> None:
+    """
+    stores the DataPoints of a day (see steps.dataSetDay()) without their spectra, with curves_only set
+
+    :param date: day
+    :param eu_ut: see steps.dataSetDay()
+    :param data_sets: DataPoints of the day
+    """
+    stripped = []
+    for data_point in data_sets:
+        if data_point is None or data_point.spectrum_data is None:
+            stripped.append(data_point)
+            continue
+        sourceKey(data_point)
+        data_point_ = copy.copy(data_point)
+        spectrum = data_point.spectrum_data
+        data_point_._spectrum_data = spectrum._with_data(np.empty((spectrum.shape[0], 0), dtype=spectrum.data.dtype))
+        data_point_.background = None
+        data_point_.summed_curve = []
+        data_point_.curves_only = True
+        stripped.append(data_point_)
+    try:
+        os.makedirs(pathCurves(""), exist_ok=True)
+        path = pathCurves(nameDataSets(date, eu_ut))
+        with open(path + f".{os.getpid()}.tmp", "wb") as file:
+            pickle.dump({"day": dayKey(date, eu_ut), "data_sets": stripped}, file)
+        os.replace(path + f".{os.getpid()}.tmp", path)
+        cache.addedSize(os.path.getsize(path))
+    except (OSError, pickle.PicklingError):
+        warnings.warn(message=f"could not store data sets of {date}", category=UserWarning)
+
+
+def loadDataSets(date: datetime.datetime, eu_ut: bool) -> Union[List[data.DataPoint], None]:
+    """
+    DataPoints of a day stored by storeDataSets(), without spectra: they only work with curves that are in the store
+
+    :param date: day
+    :param eu_ut: see steps.dataSetDay()
+    :return: DataPoints, None if the day isn't stored or its files changed since (see dayKey())
+    """
+    path = pathCurves(nameDataSets(date, eu_ut))
+    try:
+        with open(path, "rb") as file:
+            content = pickle.load(file)
+        os.utime(path)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(content, dict) or content.get("day") != dayKey(date, eu_ut):
+        return None
+    return content["data_sets"]
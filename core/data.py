@@ -9,20 +9,26 @@ contains the underlying data structure for spectra, loading them into python, ma
 low level
 """
 
+from collections import OrderedDict
 import copy
 from datetime import datetime, timedelta
+import math
 import os
 from typing import List, Union
+import uuid
 
 from radiospectra.sources.callisto import CallistoSpectrogram
+from radiospectra.spectrogram import to_signed
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from astropy.io import fits
 
 import config
+import cache
+import loader
+import manifest
+import metadata
 import stations
-import download
 import events
 
 file_ending = config.file_ending
@@ -31,26 +37,96 @@ FREQ_MAX = 1
 BIN_WIDTH_FREQUENCY = 2
 DATA_POINTS_PER_SECOND = config.DATA_POINTS_PER_SECOND
 BIN_FACTOR = config.BIN_FACTOR
-CURVE_FLATTEN_WINDOW = 100
+CURVE_FLATTEN_WINDOW = config.CURVE_FLATTEN_WINDOW
+
+
+class FrequencyIndex:
+    """
+    prefix sums of a spectrum along the frequency axis, the sum over any band of frequencies is the difference of
+    two rows instead of a sum over all rows of the band, nan and masked values count as 0
+
+    needs 8 bytes per value of the spectrum (twice that for masked spectra), so it is kept in the registry of derived
+    products (see DataPoint.createFrequencyIndex()) and counts towards config.derived_size_limit
+    """
+    def __init__(self, data: np.ndarray):
+        """
+        :param data: spectrum, frequency x time
+        """
+        mask = np.ma.getmaskarray(data) if np.ma.is_masked(data) else None
+        values = np.array(np.ma.getdata(data), dtype=np.float64)
+        if values.dtype.kind == 'f':
+            values[np.isnan(values)] = 0
+        if mask is not None:
+            values[mask] = 0
+
+        self.sums = np.zeros((values.shape[0] + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=self.sums[1:])
+        self.counts = None
+        if mask is not None:
+            self.counts = np.zeros(self.sums.shape, dtype=np.int32)
+            np.cumsum(~mask, axis=0, out=self.counts[1:])
+
+    @property
+    def shape(self) -> (int, int):
+        """
+        :return: shape of the spectrum
+        """
+        return self.sums.shape[0] - 1, self.sums.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: size of the index, see storeDerived()
+        """
+        return self.sums.nbytes + (0 if self.counts is None else self.counts.nbytes)
+
+    def bandSum(self, low: int, high: int, number_values: int) -> np.ndarray:
+        """
+        like np.nansum(data[low:high + 1, :number_values], axis=0) of the spectrum
+
+        :param low: first row of the band
+        :param high: last row of the band
+        :param number_values: length of the curve
+        :return: summed curve, nan where all values of the band are masked
+        """
+        curve = self.sums[high + 1, :number_values] - self.sums[low, :number_values]
+        if self.counts is not None:
+            curve[self.counts[high + 1, :number_values] == self.counts[low, :number_values]] = np.nan
+        return curve
 
 
 class DataPoint:
     """
     eCallisto Spectra a treated as DataPoints
     """
-    def __init__(self, file: str, debug=False):
+    def __init__(self, file: str, debug=False, lazy=False):
         """
         eCallisto Spectra a treated as DataPoints,
         ROBUST assumes the files are stored in the appropriate folder
 
         debug loads all data, that can be loaded and doesn't check, whether there are obvious errors
 
+        lazy only sets up name, date, station and frq_file from the filename and metadata.py, the spectrum gets read,
+        cleaned up and checked on the first access of spectrum_data
+
         if loading the file fails -> self.spectrum_data == None
 
         :param file: name, path not required
         :param debug: toggle debug - load all data that doesn't crash without plausibility check
+        :param lazy: toggle lazy loading of the spectrum
         """
-        self.spectrum_data = None
+        self._spectrum_data = None
+        self.loaded = True
+        self.debug = debug
+        self.lazy = lazy
+        self.frq_file = None
+        self.background = None
+        self.data_id = None
+        self.curve_id = None
+        self.source_files = []
+        self.source_key = None
+        self.curves_only = False
+        self.gaps = []
         self.number_values = None
         self.summed_curve = []
         self.binned_freq = False
@@ -81,18 +157,78 @@ class DataPoint:
             self.spectral_range_id = None
             return
         self.path = config.pathDataDay(self.date)
-        
-        try:
-            self.readFile()
-        except OSError:
-            self.spectrum_data = None
-            
-        if not self:
+        self.source_files = [os.path.join(self.path, self.file_name)]
+        values = metadata.getMetadata(os.path.join(self.path, self.file_name))
+        self.frq_file = values["frq_file"]
+        if lazy and values["corrupt"]:
             return
-        self.cleanUpData()
 
-        if not debug:
-            self.plausibleDataCheck()
+        self.loaded = False
+        if not lazy:
+            self.load()
+
+    @property
+    def spectrum_data(self) -> CallistoSpectrogram or None:
+        """
+        spectrogram of the DataPoint, read on first access for lazy DataPoints
+        """
+        if not self.loaded:
+            self.load()
+        return self._spectrum_data
+
+    @spectrum_data.setter
+    def spectrum_data(self, spectrum_data: CallistoSpectrogram or None) -> None:
+        self._spectrum_data = spectrum_data
+        self.loaded = True
+        self.dataChanged()
+
+    def dataChanged(self, data_id: Union[tuple, str, None] = None) -> None:
+        """
+        has to be called whenever the spectrum changes, drops everything that was derived from the old one
+
+        :param data_id: key of the new spectrum in the registry of derived products (see getDerived()),
+            default: new unique id
+        """
+        self.data_id = uuid.uuid4().hex if data_id is None else data_id
+        self.background = None
+        self.curve_id = None
+        self.source_key = None
+
+    def __copy__(self):
+        """
+        shallow copy with its own CallistoSpectrogram object, processing the copy doesn't change this DataPoint,
+        as processing replaces arrays instead of changing them
+        """
+        data_point = DataPoint.__new__(DataPoint)
+        data_point.__dict__.update(self.__dict__)
+        if self._spectrum_data is not None:
+            data_point._spectrum_data = copy.copy(self._spectrum_data)
+        return data_point
+
+    def load(self) -> None:
+        """
+        reads the spectrum, cleans it up and checks it for plausibility
+
+        called by __init__, or on first access of spectrum_data if lazy
+        """
+        self.loaded = True
+        try:
+            try:
+                self.readFile()
+            except OSError:
+                self.spectrum_data = None
+
+            if not self:
+                return
+            self.cleanUpData()
+
+            if not self.debug:
+                self.plausibleDataCheck()
+        except (TypeError, ValueError, AttributeError):
+            # corrupt file, raised by __init__ if not lazy
+            if not self.lazy:
+                raise
+            self.spectrum_data = None
 
     def __add__(self, other):
         """
@@ -107,20 +243,7 @@ class DataPoint:
             return temp2
         if temp2.spectrum_data is None:
             return temp1
-        try:
-
-            temp1.spectrum_data = CallistoSpectrogram.join_many([temp1.spectrum_data, temp2.spectrum_data], maxgap=None)
-            temp1.number_values = len(temp1.spectrum_data.time_axis)
-        except ValueError:
-            return temp1
-        if temp1.binned_freq != temp2.binned_freq:
-            temp1.binDataFreq()
-            temp2.binDataFreq()
-        if temp1.binned_time != temp2.binned_time:
-            temp1.binDataTime()
-            temp2.binDataTime()
-
-        return temp1
+        return mergeDataPoints([temp1, temp2])
 
     def __radd__(self, other):
         if other == 0:
@@ -138,27 +261,19 @@ class DataPoint:
 
     def readFile(self) -> None:
         """
-        reads data from file
-        called by __init__
+        reads data from file, only local files: missing files have to be downloaded before (download.prefetchDay())
+        called by load()
         """
-        data_available, station = download.dataAvailable(self.date)
-        if data_available:
-            if self.observatory is not None and self.observatory.name not in station:
-                download.downloadFullDay(self.date, station=[self.observatory.name])
-
         file = os.path.join(self.path + self.file_name)
 
-        if self.hour == 23 and self.minute > 30:
-            self.spectrum_data = self.readFalseDateFile()
-        else:
-            try:
-                self.spectrum_data = CallistoSpectrogram.read(file)
-            except TypeError:
-                self.spectrum_data = None
-                return
-            except IndexError:
-                self.spectrum_data = None
-                return
+        try:
+            self.spectrum_data = cache.readSpectrogram(file)
+        except TypeError:
+            self.spectrum_data = None
+            return
+        except IndexError:
+            self.spectrum_data = None
+            return
         if self.spectrum_data.start.day != self.day:
             self.spectrum_data = None
             return
@@ -172,42 +287,6 @@ class DataPoint:
         if self.binned_time_width != 1:
             self.binned_time = True
 
-    def readFalseDateFile(self) -> CallistoSpectrogram or None:
-        """
-        read data from file if internal end time is falsely formatted
-        :return: spectrogram_data
-        """
-        file_open = fits.open(os.path.join(self.path, self.file_name))
-        file_copy = copy.deepcopy(file_open)
-        file_open.close()
-        date_end = file_open[0].header['DATE-END']
-        time_end = file_open[0].header['TIME-END']
-        if int(time_end[:2]) == 24:
-            time_end_proper = '00' + time_end[2:]
-            date_end_proper = datetime(int(date_end[:4]), int(date_end[5:7]), int(date_end[8:10]))
-            date_end_proper = date_end_proper + timedelta(days=1)
-            date_end_proper_str = date_end_proper.strftime("%Y/%m/%d")
-        else:
-            try:
-
-                return CallistoSpectrogram.read(self.path + self.file_name)
-            except TypeError:
-                self.spectrum_data = None
-                return None
-            except OSError:
-                self.spectrum_data = None
-                return None
-
-        file_copy[0].header['DATE-END'] = date_end_proper_str
-        file_copy[0].header['TIME-END'] = time_end_proper
-        file_copy.writeto(self.path + self.file_name, overwrite=True)
-
-        try:
-            return CallistoSpectrogram.read(self.path + self.file_name)
-        except TypeError:
-            self.spectrum_data = None
-            return None
-
     def cleanUpData(self) -> None:
         """
         eCallisto data has junk data above and below the actual frequency range,
@@ -220,6 +299,7 @@ class DataPoint:
                                   :]
         self.spectrum_data.freq_axis = self.spectrum_data.freq_axis[np.argmax(self.spectrum_data.freq_axis):np.argmin(
             self.spectrum_data.freq_axis) + 1]
+        self.dataChanged()
 
     def binDataFreq(self, bin_width=BIN_WIDTH_FREQUENCY, method='median') -> None:
         """
@@ -233,25 +313,19 @@ class DataPoint:
             raise Exception
         frequency_min = self.observatory.spectral_range[FREQ_MIN]
         frequency_max = self.observatory.spectral_range[FREQ_MAX]
-        data = self.spectrum_data.data.transpose()
         frequency_range = np.arange(frequency_max, frequency_min - bin_width, -bin_width)
 
-        entries_per_bin = len(self.spectrum_data.freq_axis) / len(frequency_range)
-        data_binned = [[] for i in range(self.number_values)]
-
-        if method == 'median':
-            for line in range(len(data)):
-                for bin_ in range(len(frequency_range)):
-                    data_binned[line].append(
-                        np.nanmedian(data[line][int(bin_ * entries_per_bin):int((bin_ + 1) * entries_per_bin)]))
-        if method == 'mean':
-            for line in range(len(data)):
-                for bin_ in range(len(frequency_range)):
-                    data_binned[line].append(
-                        np.nanmean(data[line][int(bin_ * entries_per_bin):int((bin_ + 1) * entries_per_bin)]))
+        key = (self.data_id, "bin_freq", bin_width, method)
+        data = getDerived(key)
+        if data is None:
+            entries_per_bin = len(self.spectrum_data.freq_axis) / len(frequency_range)
+            edges = [int(bin_ * entries_per_bin) for bin_ in range(len(frequency_range) + 1)]
+            data = reduceBins(self.spectrum_data.data, edges, method=method).astype(config.spectrum_dtype, copy=False)
+            storeDerived(key, data)
 
-        self.spectrum_data.data = np.array(data_binned).transpose()
+        self.spectrum_data.data = data
         self.spectrum_data.freq_axis = frequency_range
+        self.dataChanged(key)
         self.binned_freq = True
 
     def binDataTime(self, width=BIN_FACTOR, method='median') -> None:
@@ -276,30 +350,34 @@ class DataPoint:
             new_width = int(np.around(width, 0))
         if not new_width:
             raise ValueError(f"Impossible to bin {self} to width: {width}")
+        if method != 'median' and method != 'mean':
+            raise Exception
         time_min = self.spectrum_data.time_axis[0]
-        time_max = self.spectrum_data.time_axis[-1]
-        data = self.spectrum_data.data
         new_data_per_second = self.points_per_second / new_width
-        time_range = np.arange(time_min, time_max, 1 / new_data_per_second)
-
-        if method == 'median':
-            data_binned = np.array([pd.Series(data[i]).rolling(new_width).median() for i in range(data.shape[0])])
-        elif method == 'mean':
-            data_binned = np.array([pd.Series(data[i]).rolling(new_width).mean() for i in range(data.shape[0])])
-        else:
-            raise Exception
-
-        data_binned_cut = data_binned[:, (new_width - 1)::new_width]
-        cut_out_num = data.shape[1] % 4
-        if cut_out_num:
-            data_binned_append = np.array([np.nanmedian([data[i, -cut_out_num:]]) for i in range(data.shape[0])])
-            self.spectrum_data.data = np.c_[data_binned_cut, data_binned_append]
-        else:
-            self.spectrum_data.data = data_binned_cut
 
-        time_range = time_range[:self.spectrum_data.data.shape[1]]
+        key = (self.data_id, "bin_time", new_width, method)
+        data_binned = getDerived(key)
+        if data_binned is None:
+            data = self.spectrum_data.data
+            if isinstance(data, np.ma.MaskedArray):
+                # masked values are nan, any nan makes the whole bin nan
+                data = data.astype(data.dtype if data.dtype.kind == 'f' else np.float64).filled(np.nan)
+
+            # non overlapping bins of new_width values, the remaining values at the end make up the last bin
+            blocks = data.shape[1] // new_width
+            parts = [data[:, :blocks * new_width].reshape(data.shape[0], blocks, new_width)]
+            if data.shape[1] % new_width:
+                parts.append(data[:, np.newaxis, blocks * new_width:])
+            if method == 'median':
+                data_binned = [np.median(part, axis=-1) for part in parts]
+            else:
+                data_binned = [np.mean(part, axis=-1, dtype=np.float64) for part in parts]
+            data_binned = np.concatenate(data_binned, axis=1).astype(config.spectrum_dtype, copy=False)
+            storeDerived(key, data_binned)
+        self.spectrum_data.data = data_binned
 
-        self.spectrum_data.time_axis = time_range
+        self.spectrum_data.time_axis = time_min + np.arange(self.spectrum_data.data.shape[1]) / new_data_per_second
+        self.dataChanged(key)
         self.binned_time = True
         self.binned_time_width = width
         self.points_per_second = new_data_per_second
@@ -314,9 +392,15 @@ class DataPoint:
             return
         self.spectrum_data.peek()
 
+    def dataPerSecond(self) -> float:
+        """
+        :return: values per second of the spectrum, rounded to two decimals (see gridIndices())
+        """
+        return np.round(self.number_values / (self.spectrum_data.end - self.spectrum_data.start).total_seconds(), 2)
+
     def createSummedCurve(self, frequency_range: List[float] or None = None, debug: bool = False) -> None:
         """
-        creates summed intensity curve, takes whole frequency range if not defined
+        creates summed intensity curve (np.ndarray), takes whole frequency range if not defined
 
         debug == False: sets unreasonably low values to median(curve)
 
@@ -326,43 +410,148 @@ class DataPoint:
         if frequency_range is None:
             frequency_range = [self.spectrum_data.freq_axis[-1], self.spectrum_data.freq_axis[0]]
 
-        freq_high = (np.where(self.spectrum_data.freq_axis == max(
-            self.spectrum_data.freq_axis[self.spectrum_data.freq_axis <= frequency_range[1]])))[0][0]
-        freq_low = (np.where(self.spectrum_data.freq_axis == min(
-            self.spectrum_data.freq_axis[self.spectrum_data.freq_axis >= frequency_range[0]])))[0][0]
+        freq_high, freq_low = channelRange(self.spectrum_data.freq_axis, frequency_range)
+
+        key = (self.data_id, "curve", int(freq_high), int(freq_low), self.number_values, debug)
+        curve = getDerived(key)
+        if curve is not None:
+            self.summed_curve = curve
+            self.curve_id = key
+            return
 
-        self.summed_curve = [np.nansum(self.spectrum_data.data.transpose()[time][freq_high:freq_low + 1]) for time
-                             in range(self.number_values)]
+        frequency_index = getDerived((self.data_id, "frequency_index"))
+        if frequency_index is not None and frequency_index.shape == self.spectrum_data.data.shape:
+            curve = frequency_index.bandSum(freq_high, freq_low, self.number_values)
+        else:
+            # float64 accumulator, compact spectra (see config.spectrum_dtype) would lose precision in long sums
+            # masked values (gaps) don't count, completely masked time steps are nan
+            curve = np.nansum(self.spectrum_data.data[freq_high:freq_low + 1, :self.number_values], axis=0,
+                              dtype=np.float64)
+            curve = np.ma.filled(curve, np.nan)
 
         if not debug:
-            curve = np.array(self.summed_curve)
-            max_curve = np.nanmax(curve)
-            mask = np.array([(i < 0) and (abs(i) > 2 * max_curve) for i in curve])
-            curve[mask] = np.nanmedian(curve)
-            self.summed_curve = curve.tolist()
+            cleanSummedCurve(curve)
+        storeDerived(key, curve)
+        self.summed_curve = curve
+        self.curve_id = key
+
+    def createBandCurves(self, band_width: float) -> np.ndarray:
+        """
+        summed curves of the standard frequency bands [k * band_width, (k + 1) * band_width) MHz, like
+        createSummedCurve(debug=True) over the channels of each band, without setting low values to the median
+
+        :param band_width: MHz
+        :return: (band, time), row k is band k, nan for bands without channels
+        """
+        key = (self.data_id, "bands", float(band_width), self.number_values)
+        bands = getDerived(key)
+        if bands is not None:
+            return bands
+
+        band = bandIndex(self.spectrum_data.freq_axis, band_width)
+        bands = np.full((max(band.max() + 1, 0) if len(band) else 0, self.number_values), np.nan)
+        for k in np.unique(band[band >= 0]):
+            bands[k] = self.bandCurve(k, band_width)
+        storeDerived(key, bands)
+        return bands
+
+    def bandCurve(self, band: int, band_width: float, frequency_range: List[float or None] or None = None) \
+            -> np.ndarray:
+        """
+        summed curve of the channels of a standard frequency band (see createBandCurves()) that
+        createSummedCurve(frequency_range) sums up, the part of a band at the edge of a frequency range
+
+        :param band: index of the band
+        :param band_width: MHz
+        :param frequency_range: optional: lower and upper frequency, None for a side where the range goes on beyond
+            the band, default: whole band
+        :return: summed curve, nan if the band has no such channels
+        """
+        freq_axis = np.asarray(self.spectrum_data.freq_axis)
+        selected = bandIndex(freq_axis, band_width) == band
+        if frequency_range is not None:
+            # the same channels as createSummedCurve() of the whole range, on the whole axis (duplicate frequencies)
+            frequency_low, frequency_high = frequency_range
+            if frequency_high is not None:
+                below = freq_axis[freq_axis <= frequency_high]
+                selected[:np.where(freq_axis == max(below))[0][0] if len(below) else len(selected)] = False
+            if frequency_low is not None:
+                above = freq_axis[freq_axis >= frequency_low]
+                selected[np.where(freq_axis == min(above))[0][0] + 1 if len(above) else 0:] = False
+        channels = np.flatnonzero(selected)
+        if not len(channels):
+            return np.full(self.number_values, np.nan)
+        curve = np.nansum(self.spectrum_data.data[channels.min():channels.max() + 1, :self.number_values], axis=0,
+                          dtype=np.float64)
+        return np.ma.filled(curve, np.nan)
+
+    def createFrequencyIndex(self) -> None:
+        """
+        keeps prefix sums of the spectrum along the frequency axis (see FrequencyIndex), createSummedCurve() for any
+        frequency range costs a single subtraction per time step afterwards
+
+        the index is a derived product of the spectrum (see getDerived()), copies of the DataPoint share it until
+        their spectrum changes, it can get removed from the registry any time, drop it with dropFrequencyIndex()
+        as soon as the curves are done
+        """
+        if self.spectrum_data is None:
+            return
+        key = (self.data_id, "frequency_index")
+        frequency_index = getDerived(key)
+        if frequency_index is None or frequency_index.shape != self.spectrum_data.data.shape:
+            storeDerived(key, FrequencyIndex(self.spectrum_data.data))
+
+    def dropFrequencyIndex(self) -> None:
+        """
+        removes the index of createFrequencyIndex() from the registry of derived products
+        """
+        dropDerived((self.data_id, "frequency_index"))
 
     def plausibleDataCheck(self) -> None:
         """
-        ignores faulty data, if constant very high values get recognised
+        ignores faulty data, if constant very high values get recognised (see cache.plausibilityCount()),
+        the statistic comes with the spectrum: it is computed while decoding the file and stored in its cache entry
 
         call by __init__ if not debug mode
         """
-        self.createSummedCurve()
-        self.flattenSummedCurve()
-        max_values = np.argwhere(self.summed_curve > np.nanmax(self.summed_curve) * 0.98)
-        if len(max_values) > (self.number_values / 35):
+        if self.spectrum_data.plausibility_count > self.number_values / 35:
             self.spectrum_data = None
-        self.summed_curve = []
 
     def subtractBackground(self) -> None:
         """
         subtracts background, possibly only mean per frequency
+
+        like CallistoSpectrogram.subtract_bg(), but the result is stored as config.spectrum_dtype
+        and the background comes from backgroundProfile()
         """
         if self.background_subtracted:
             return
-        self.spectrum_data = self.spectrum_data.subtract_bg()
+        key = (self.data_id, "background")
+        data = getDerived(key)
+        if data is None:
+            data = np.subtract(self.spectrum_data.data, self.backgroundProfile()[:, np.newaxis],
+                               dtype=config.spectrum_dtype)
+            storeDerived(key, data)
+        self.spectrum_data = self.spectrum_data._with_data(data)
+        self.dataChanged(key)
         self.background_subtracted = True
 
+    def backgroundProfile(self) -> np.ndarray:
+        """
+        constant background of every frequency channel (see constBackground()), computed once per spectrum,
+        DataPoints cut out of another one use the background of the whole spectrum if config.background_from_parent
+
+        :return: background, one value per frequency
+        """
+        if self.background is not None:
+            return self.background
+        key = (self.data_id, "background_profile")
+        background = getDerived(key)
+        if background is None:
+            background = constBackground(self.spectrum_data.data)
+            storeDerived(key, background)
+        return background
+
     def flattenSummedCurve(self, rolling_window: None or int = None) -> None:
         """
         subtracts median of the curve dynamically if the curve is longer than 3 * default file length of a spectrum
@@ -374,14 +563,16 @@ class DataPoint:
         if rolling_window is None:
             rolling_window = CURVE_FLATTEN_WINDOW
 
-        if self.number_values > 3 * config.LENGTH_FILES_MINUTES * 60 * config.DATA_POINTS_PER_SECOND:
-            median = np.array(pd.Series(self.summed_curve).rolling(rolling_window).median())
-            self.flattened_window = rolling_window
-        else:
-            median = np.nanmedian(self.summed_curve)
-            self.flattened_window = 0
-        arr = np.array(self.summed_curve)
-        self.summed_curve = arr - median
+        self.flattened_window = flattenWindow(self.number_values, rolling_window)
+
+        key = None if self.curve_id is None else (self.curve_id, "flatten", self.flattened_window)
+        curve = None if key is None else getDerived(key)
+        if curve is None:
+            curve = detrendCurve(self.summed_curve, self.flattened_window)
+            if key is not None:
+                storeDerived(key, curve)
+        self.summed_curve = curve
+        self.curve_id = key
         self.flattened = True
 
     def plotSummedCurve(self, ax, peaks: None or List[str] = None, label=None, color=None) \
@@ -424,22 +615,108 @@ class DataPoint:
         return datetime(year=self.year, month=self.month, day=self.day,
                         hour=self.hour, minute=self.minute, second=self.second)
 
-    def cutToTime(self, start: datetime or None = None, end: datetime or None = None) -> None:
+    def cutToTime(self, start: datetime or None = None, end: datetime or None = None) -> "DataPoint":
         """
-        Cuts spectrum to new start and end times
-        TODO: implement
+        cuts the spectrum to new start and end times without copying it, the spectrum of the returned DataPoint is
+        a view of the spectrum of this one, start and end get clipped to the spectrum
+
+        never change the data of either of them in place (see analysis.applyMaskBadFrequency()),
+        replace spectrum_data.data instead
+
+        :param start: new start, default: start of the spectrum
+        :param end: new end, default: end of the spectrum
+        :return: new DataPoint
         """
-        raise NotImplementedError("Feature not implemented yet.")
+        spectrum = self.spectrum_data
+        if start is None or start < spectrum.start:
+            start = spectrum.start
+        if end is None or end > spectrum.end:
+            end = spectrum.end
+        index_start = int((start - spectrum.start).total_seconds() * self.points_per_second)
+        index_end = max(int((end - spectrum.start).total_seconds() * self.points_per_second), index_start)
+
+        data = spectrum.data[:, index_start:index_end]
+        if isinstance(data, np.ma.MaskedArray) and not np.ma.is_masked(data):
+            # masked arrays are a lot slower, drop the mask if nothing of the cut out part is masked
+            data = data.data
+
+        data_point = copy.copy(self)
+        data_point.spectrum_data = spectrum._with_data(data)
+        data_point.spectrum_data.start = start
+        data_point.spectrum_data.end = max(start, end)
+        data_point.spectrum_data.t_init = spectrum.t_init + index_start / self.points_per_second
+        data_point.spectrum_data.time_axis = np.arange(data_point.spectrum_data.shape[1]) / self.points_per_second
+        data_point.number_values = data_point.spectrum_data.shape[1]
+        data_point.gaps = [[max(position, index_start) - index_start,
+                            min(position + width, index_end) - max(position, index_start)]
+                           for position, width in self.gaps
+                           if min(position + width, index_end) > max(position, index_start)]
+        data_point.summed_curve = self.summed_curve[index_start:index_end]
+        data_point.curve_id = None
+        if config.background_from_parent and not self.background_subtracted:
+            data_point.background = self.backgroundProfile()
+        return data_point
+
+
+def getDerived(key: tuple) -> Union[np.ndarray, None]:
+    """
+    registry of derived products of spectra (background subtracted and binned spectra, summed and flattened curves,
+    frequency indices), so every station gets processed once per set of parameters instead of once per pair
+
+    keys start with the DataPoint.data_id of the input, followed by the processing step and its parameters,
+    the key of a product is the data_id of DataPoints with that product as spectrum,
+    products are shared and must never be changed in place
+
+    :param key: key of the product
+    :return: product, None if it isn't in the registry (anymore)
+    """
+    product = getDerived.registry.get(key)
+    if product is not None:
+        getDerived.registry.move_to_end(key)
+    return product
+
+
+getDerived.registry = OrderedDict()
+getDerived.size = 0
+
 
+def storeDerived(key: tuple, product: np.ndarray) -> None:
+    """
+    adds a product to the registry of getDerived(), removes the least recently used products above
+    config.derived_size_limit
+
+    :param key: key of the product
+    :param product: array or FrequencyIndex
+    """
+    if key in getDerived.registry:
+        getDerived.size -= getDerived.registry.pop(key).nbytes
+    getDerived.registry[key] = product
+    getDerived.size += product.nbytes
+    while getDerived.size > config.derived_size_limit and getDerived.registry:
+        getDerived.size -= getDerived.registry.popitem(last=False)[1].nbytes
+
+
+def dropDerived(key: tuple) -> None:
+    """
+    removes a product from the registry of getDerived()
 
-def createDayList(*date: Union[int, datetime], station: Union[stations.Station, str], debug=False) \
+    :param key: key of the product
+    """
+    if key in getDerived.registry:
+        getDerived.size -= getDerived.registry.pop(key).nbytes
+
+
+def createDayList(*date: Union[int, datetime], station: Union[stations.Station, str], debug=False, lazy=False) \
         -> List[DataPoint]:
     """
     Creates a list with DataPoints for a specific day for a Observatory with a specific spectral range
 
+    lazy DataPoints are not checked for valid data, filter them afterwards
+
     :param date: datetime or Ints for year, month, day
     :param station:
     :param debug: toggle debug mode (enabled: load all data, even obviously corrupted ones, that can be loaded)
+    :param lazy: toggle lazy DataPoints, spectra are read on first access
     :return: List[DataPoints]
     """
     date_ = config.getDateFromArgs(*date)
@@ -451,23 +728,21 @@ def createDayList(*date: Union[int, datetime], station: Union[stations.Station,
         focus_code = station.focus_code
         station_name = station.name
 
-    path = config.pathDataDay(date_)
-    files_day = sorted(os.listdir(path))
-    files_observatory = []
+    files_observatory = manifest.getManifest(date_).files(station_name, focus_code)
     data_day = []
 
-    for file in files_day:
-        if file.startswith(station_name + stations.seperator) and file.endswith(focus_code + file_ending):
-            files_observatory.append(file)
-
     for file in files_observatory:
         try:
-            data_day.append(DataPoint(file, debug=debug))
+            data_day.append(DataPoint(file, debug=debug, lazy=True))
         except (TypeError, ValueError, AttributeError):
             # AttributeError, TypeError : corrupt file
             # ValueError: invalid spectral range id
             pass
 
+    if lazy:
+        # lazy DataPoints are only loaded already if the file could not be used
+        return [i for i in data_day if not i.loaded]
+    loader.loadDataPoints(data_day)
     data_day_return = [i for i in data_day if i]
     return data_day_return
 
@@ -482,11 +757,11 @@ def createDay(*date: Union[int, datetime], station: Union[stations.Station, str]
     :param debug: ignore obvious wrong data in non-debug mode
     :return: DataPoint of all data for a day
     """
-    return sum(createDayList(*date, station=station, debug=debug))
+    return mergeDataPoints(createDayList(*date, station=station, debug=debug))
 
 
-def createFromTime(*date: Union[int, datetime], station: Union[stations.Station, str], extent=True, debug=False) \
-        -> DataPoint:
+def createFromTime(*date: Union[int, datetime], station: Union[stations.Station, str], extent=True, debug=False,
+                   data_sets: Union[List[DataPoint], None] = None) -> DataPoint:
     """
     creates DataPoint for a datetime and station, extent loads closest next/previous file to the edge of the file.
 
@@ -494,6 +769,8 @@ def createFromTime(*date: Union[int, datetime], station: Union[stations.Station,
     :param station:
     :param extent: use data from adjacent file
     :param debug: passes debug argument to Datapoint upon creation - loads invalid files
+    :param data_sets: optional, already loaded DataPoints (see steps.dataSetDay()), the timeframe of the files gets
+        cut out of them instead of reading the files, if one of them covers it
     :return:
     """
     date_ = config.getDateFromArgs(*date)
@@ -505,38 +782,45 @@ def createFromTime(*date: Union[int, datetime], station: Union[stations.Station,
         focus_code = station.focus_code
         station_name = station.name
 
-    path = config.pathDataDay(date_)
-    files = sorted(os.listdir(path))
+    manifest_day = manifest.getManifest(date_)
+    files_filtered = manifest_day.files(station_name, focus_code)
     time_target = date_.hour * 3600 + date_.minute * 60 + date_.second
-    files_filtered = []
-    for file in files:
-        if file.startswith(station_name + stations.seperator) and file.endswith(focus_code + file_ending):
-            files_filtered.append(file)
-    for i, file in enumerate(files_filtered):
-        time_read = file.rsplit('_')[2]
-        hour = int(time_read[:2])
-        minute = int(time_read[2:4])
-        second = int(time_read[4:])
-        time_file = hour * 3600 + minute * 60 + second
-        time_diff = time_target - time_file
-        if 0 <= time_diff < 15 * 60:
-            dp0 = DataPoint(file, debug=debug)
-            dp = dp0
-            if extent and i and ((date_.minute * 60 + date_.second) - (minute * 60 + second) < (5 * 60)):
-                dp_ahead = DataPoint(files_filtered[i - 1], debug=debug)
-                if dp_ahead.spectrum_data is not None and frqProfile(dp) == frqProfile(dp_ahead):
-                    dp = dp_ahead + dp0
-            if extent and i + 1 < len(files_filtered) and (
-                    ((date_.minute * 60 + date_.second) - (minute * 60 + second)) > (10 * 60)):
-                dp_after = DataPoint(files_filtered[i + 1], debug=debug)
-                if dp_after.spectrum_data is not None and frqProfile(dp) == frqProfile(dp_after):
-                    dp = dp0 + dp_after
-            return dp
-    raise FileNotFoundError("No file for the specified time and station found.")
+    i = manifest_day.fileAtTime(station_name, focus_code, time_target)
+    if i < 0:
+        raise FileNotFoundError("No file for the specified time and station found.")
+
+    time_diff = time_target - manifest_day.entry(station_name, focus_code, i)[manifest.TIME]
+    if data_sets is not None:
+        time_file_start = manifest_day.entry(station_name, focus_code, i)[manifest.TIME]
+        time_file_end = time_file_start + config.LENGTH_FILES_MINUTES * 60
+        if extent and i and time_diff < (5 * 60):
+            time_file_start = manifest_day.entry(station_name, focus_code, i - 1)[manifest.TIME]
+        if extent and i + 1 < len(files_filtered) and time_diff > (10 * 60):
+            time_file_end = manifest_day.entry(station_name, focus_code, i + 1)[manifest.TIME] \
+                            + config.LENGTH_FILES_MINUTES * 60
+        day_start = datetime(date_.year, date_.month, date_.day)
+        time_start = day_start + timedelta(seconds=time_file_start)
+        time_end = day_start + timedelta(seconds=time_file_end)
+        dp_day = findDataPoint(data_sets, station_name, focus_code, time_start, time_end)
+        if dp_day is not None:
+            return dp_day.cutToTime(time_start, time_end)
+
+    dp0 = DataPoint(files_filtered[i], debug=debug)
+    dp = dp0
+    if extent and i and time_diff < (5 * 60):
+        dp_ahead = DataPoint(files_filtered[i - 1], debug=debug)
+        if dp_ahead.spectrum_data is not None and frqProfile(dp) == frqProfile(dp_ahead):
+            dp = mergeDataPoints([dp_ahead, dp0])
+    if extent and i + 1 < len(files_filtered) and time_diff > (10 * 60):
+        dp_after = DataPoint(files_filtered[i + 1], debug=debug)
+        if dp_after.spectrum_data is not None and frqProfile(dp) == frqProfile(dp_after):
+            dp = mergeDataPoints([dp0, dp_after])
+    return dp
 
 
 def createFromEvent(event: events.Event, station: stations.Station or None = None,
-                    debug: bool = False, extent: bool = True) -> DataPoint:
+                    debug: bool = False, extent: bool = True,
+                    data_sets: Union[List[DataPoint], None] = None) -> DataPoint:
     """
     creates a DataPoint from an Event with either the default station or a specific one
 
@@ -545,6 +829,8 @@ def createFromEvent(event: events.Event, station: stations.Station or None = Non
         only applies if station is part fo event or if event has no stations
     :param debug: passes debug argument to Datapoint upon creation - loads invalid files
     :param extent: use data from adjacent file if too little data is in source file
+    :param data_sets: optional, already loaded DataPoints (see steps.dataSetDay()), the event gets cut out of them
+        instead of reading the files, if one of them covers it
     :return:
     """
     time_start = event.time_start
@@ -556,14 +842,19 @@ def createFromEvent(event: events.Event, station: stations.Station or None = Non
     else:
         obs = event.stations[0]
 
-    dp = createFromTime(time_start, station=obs, debug=debug, extent=True)
+    dp = None
+    if data_sets is not None:
+        dp = findDataPoint(data_sets, getattr(obs, "name", obs), getattr(obs, "focus_code", None),
+                           time_start, time_end)
+    if dp is None:
+        dp = createFromTime(time_start, station=obs, debug=debug, extent=True)
     i = 1
     while dp.spectrum_data.end < time_end and dp.spectrum_data.header is not None:
         new_time = time_start + timedelta(minutes=config.LENGTH_FILES_MINUTES * i)
         try:
             dp_close = createFromTime(new_time, station=obs, debug=debug, extent=False)
             if dp_close.spectrum_data.header is not None and frqProfile(dp) == frqProfile(dp_close):
-                dp += dp_close
+                dp = mergeDataPoints([dp, dp_close])
         except FileNotFoundError:
             pass
         i += 1
@@ -578,20 +869,7 @@ def createFromEvent(event: events.Event, station: stations.Station or None = Non
     else:
         delta = timedelta(minutes=3)
 
-    del_start = int((event.time_start - dp.spectrum_data.start - delta).total_seconds()
-                    * dp.points_per_second)
-    del_end = int((event.time_end - dp.spectrum_data.start + delta).total_seconds()
-                  * dp.points_per_second)
-
-    dp.spectrum_data.end = event.time_end + delta
-    dp.spectrum_data.start = event.time_start - delta
-
-    if del_start < 0:
-        del_start = 0
-    dp.spectrum_data.data = dp.spectrum_data.data[:, del_start:del_end]
-    dp.spectrum_data.time_axis = np.arange(0, dp.spectrum_data.shape[1] / dp.points_per_second,
-                                           1 / dp.points_per_second)
-    dp.number_values = min(dp.spectrum_data.data.shape[1], len(dp.spectrum_data.time_axis))
+    dp = dp.cutToTime(event.time_start - delta, event.time_end + delta)
 
     if len(dp.spectrum_data.time_axis) < config.ROLL_WINDOW / config.BIN_FACTOR * 10:
         dp.spectrum_data = None
@@ -599,6 +877,288 @@ def createFromEvent(event: events.Event, station: stations.Station or None = Non
     return dp
 
 
+def constBackground(data: np.ndarray, amount: float = 0.05) -> np.ndarray:
+    """
+    same as CallistoSpectrogram.auto_const_bg(): average of the amount of points in time with the lowest standard
+    deviation over all frequencies (after subtracting the mean of every frequency), without sorting in python
+
+    :param data: spectrum, frequency x time
+    :param amount: part of the points in time that are averaged
+    :return: background, one value per frequency
+    """
+    data_signed = data.astype(to_signed(data.dtype))
+    sdevs = np.asarray(np.std(data_signed - np.average(data, 1).reshape(data.shape[0], 1), 0))
+    candidates = np.argsort(sdevs, kind='stable')[:max(1, int(amount * data.shape[1]))]
+    return np.average(data[:, candidates], 1)
+
+
+def reduceBins(data: np.ndarray, edges: List[int], method='median') -> np.ndarray:
+    """
+    reduces the rows data[edges[i]:edges[i + 1]] of every bin to a single row, same results as np.nanmedian() or
+    np.nanmean() of every column of every bin, but all bins of the same size get reduced at once
+
+    masked values are treated as nan
+
+    :param data: 2D array, gets binned along the first axis
+    :param edges: first row of every bin and the end of the last bin
+    :param method: 'median' or 'mean'
+    :return: array (len(edges) - 1, data.shape[1]), nan for empty bins
+    """
+    dtype = data.dtype if data.dtype.kind == 'f' else np.dtype(np.float64)
+    if isinstance(data, np.ma.MaskedArray):
+        data = data.astype(dtype).filled(np.nan)
+    edges = np.minimum(np.asarray(edges, dtype=int), data.shape[0])
+    starts = edges[:-1]
+    sizes = np.maximum(edges[1:] - starts, 0)
+
+    data_t = data.transpose()
+    binned = np.full((data.shape[1], len(sizes)), np.nan, dtype=dtype)
+    for size in np.unique(sizes[sizes > 0]):
+        bins = np.flatnonzero(sizes == size)
+        # time, bin, values of the bin: reduction over the last, contiguous axis in the same order as for a slice
+        values = np.take(data_t, starts[bins, np.newaxis] + np.arange(size), axis=1)
+        if method == 'mean':
+            binned[:, bins] = np.nanmean(values, axis=-1)
+        elif method == 'median':
+            values.sort(axis=-1)
+            if values.dtype.kind == 'f':
+                count = size - np.count_nonzero(np.isnan(values), axis=-1)
+            else:
+                count = np.full(values.shape[:-1], size)
+            low = np.take_along_axis(values, np.maximum((count - 1) // 2, 0)[..., np.newaxis], axis=-1)[..., 0]
+            high = np.take_along_axis(values, (count // 2)[..., np.newaxis], axis=-1)[..., 0]
+            median = np.where(count % 2, low, (low.astype(dtype) + high) / 2)
+            median[count == 0] = np.nan
+            binned[:, bins] = median
+        else:
+            raise ValueError(f"unknown method {method}")
+    return binned.transpose()
+
+
+def channelRange(freq_axis: np.ndarray, frequency_range: List[float]) -> (int, int):
+    """
+    :param freq_axis: frequency axis of a spectrum (descending)
+    :param frequency_range: lower and upper frequency
+    :return: indices of the highest and the lowest channel in the frequency range (see DataPoint.createSummedCurve()),
+        ValueError if there is no channel below the upper or above the lower frequency
+    """
+    freq_high = (np.where(freq_axis == max(freq_axis[freq_axis <= frequency_range[1]])))[0][0]
+    freq_low = (np.where(freq_axis == min(freq_axis[freq_axis >= frequency_range[0]])))[0][0]
+    return freq_high, freq_low
+
+
+def bandIndex(frequencies: np.ndarray, band_width: float) -> np.ndarray:
+    """
+    :param frequencies: MHz
+    :param band_width: MHz
+    :return: standard band k of every frequency, k * band_width <= frequency < (k + 1) * band_width
+    """
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    band = np.floor(frequencies / band_width).astype(int)
+    # exactly like the comparison with the limits of the bands, the division rounds
+    band[frequencies < band * band_width] -= 1
+    band[frequencies >= (band + 1) * band_width] += 1
+    return band
+
+
+def cleanSummedCurve(curve: np.ndarray) -> None:
+    """
+    sets unreasonably low values of a summed curve to the median of the curve, in place
+
+    :param curve: summed curve
+    """
+    mask = (curve < 0) & (np.abs(curve) > 2 * np.nanmax(curve))
+    curve[mask] = np.nanmedian(curve)
+
+
+def flattenWindow(number_values: int, rolling_window: int) -> int:
+    """
+    :param number_values: length of the curve
+    :param rolling_window: window for curves that are longer than 3 * default file length of a spectrum
+    :return: window of the rolling median that gets subtracted from the curve, 0: fixed median (see detrendCurve())
+    """
+    if number_values > 3 * config.LENGTH_FILES_MINUTES * 60 * config.DATA_POINTS_PER_SECOND:
+        return rolling_window
+    return 0
+
+
+def detrendCurve(curve: np.ndarray, window: int) -> np.ndarray:
+    """
+    subtracts the median of a curve, pandas.Series.rolling(window).median() or a fixed median for window 0
+
+    :param curve: summed curve, doesn't get changed
+    :param window: number of values of the rolling window, 0 for a fixed median (see flattenWindow())
+    :return: flattened curve, nan for the first window - 1 values if rolling
+    """
+    curve = np.asarray(curve, dtype=np.float64)
+    if not window:
+        return curve - np.nanmedian(curve)
+    return curve - pd.Series(curve).rolling(window).median().to_numpy()
+
+
+def gridIndices(start: float, data_per_second: float, length: int, grid_per_second: float) \
+        -> (int, Union[np.ndarray, None]):
+    """
+    maps values at start + i / data_per_second (i < length) to the canonical time grid, which has its points at
+    multiples of 1 / grid_per_second seconds since the epoch: every point of the grid gets the latest value that isn't
+    after it. curves of different stations on the grid line up by integer offsets, without resampling per pair
+
+    :param start: timestamp of the first value
+    :param data_per_second: values per second
+    :param length: number of values
+    :param grid_per_second: points per second of the grid
+    :return: index of the first point of the grid, index of the value of every point of the grid from there
+        (None: the values themselves, same rate as the grid)
+    """
+    position = start * grid_per_second
+    offset = math.ceil(position - 1e-6)
+    if data_per_second == grid_per_second:
+        return offset, None
+    number = max(math.ceil(position + length * grid_per_second / data_per_second - offset - 1e-6), 0)
+    index = np.floor((offset - position + np.arange(number)) * (data_per_second / grid_per_second) + 1e-9)
+    return offset, index[index < length].astype(int)
+
+
+def curveOnGrid(curve: np.ndarray, start: float, data_per_second: float, grid_per_second: float) -> (int, np.ndarray):
+    """
+    :param curve: values at start + i / data_per_second
+    :param start: timestamp of the first value
+    :param data_per_second: values per second
+    :param grid_per_second: points per second of the grid
+    :return: index of the first point of the grid (see gridIndices()), curve on the grid
+    """
+    offset, index = gridIndices(start, data_per_second, len(curve), grid_per_second)
+    if index is None:
+        return offset, curve
+    return offset, np.take(np.asarray(curve), index)
+
+
+def findDataPoint(data_sets: List[DataPoint], station_name: str, focus_code: Union[str, None],
+                  start: datetime, end: datetime) -> Union[DataPoint, None]:
+    """
+    searches already loaded DataPoints for one of a station, that covers a timeframe
+
+    :param data_sets: DataPoints, e.g. of steps.dataSetDay()
+    :param station_name: name of the station
+    :param focus_code: focus code of the station, None: any
+    :param start: start of the timeframe
+    :param end: end of the timeframe
+    :return: first DataPoint that covers the whole timeframe without a gap, None if there is none
+    """
+    for data_point in data_sets:
+        if data_point is None or data_point.observatory is None or data_point.observatory.name != station_name:
+            continue
+        if focus_code is not None and data_point.spectral_range_id != focus_code:
+            continue
+        # DataPoints of the curve store have no spectrum (see curves.loadDataSets())
+        if data_point.curves_only or data_point.spectrum_data is None:
+            continue
+        spectrum = data_point.spectrum_data
+        if not (spectrum.start <= start and end <= spectrum.end):
+            continue
+        # positions of the gaps like in cutToTime(), the files might have data there
+        index_start = int((start - spectrum.start).total_seconds() * data_point.points_per_second)
+        index_end = max(int((end - spectrum.start).total_seconds() * data_point.points_per_second), index_start)
+        if any(position < index_end and index_start < position + width for position, width in data_point.gaps):
+            continue
+        return data_point
+    return None
+
+
+def mergeDataPoints(data_points: List[DataPoint]) -> Union[DataPoint, None]:
+    """
+    merges DataPoints of the same station, focus code and frequency range into a single one, like sum(data_points),
+    but the time grid is computed once and every spectrum is copied exactly once (see joinSpectra())
+
+    DataPoints without data and DataPoints with other frequency channels than the first one get skipped,
+    the merged DataPoint keeps the positions of gaps in self.gaps
+
+    :param data_points: List[DataPoint] sorted by time
+    :return: merged DataPoint, the DataPoint itself for a single one, None for an empty list
+    """
+    if not data_points:
+        return None
+    valid = [i for i in data_points if i.spectrum_data is not None]
+    if not valid:
+        return data_points[-1]
+    if len(valid) == 1:
+        return valid[0]
+
+    valid = [valid[0]] + [i for i in valid[1:]
+                          if np.array_equal(i.spectrum_data.freq_axis, valid[0].spectrum_data.freq_axis)]
+    spectrum, positions, gaps = joinSpectra([i.spectrum_data for i in valid])
+    for data_point, position in zip(valid, positions):
+        gaps.extend([[position + i[0], i[1]] for i in data_point.gaps])
+
+    merged = copy.copy(valid[0])
+    merged.spectrum_data = spectrum
+    merged.source_files = [file for data_point in valid for file in data_point.source_files]
+    merged.number_values = len(spectrum.time_axis)
+    merged.gaps = sorted(i for i in gaps if i[0] < merged.number_values)
+    if any(i.binned_freq != merged.binned_freq for i in valid):
+        merged.binDataFreq()
+    if any(i.binned_time != merged.binned_time for i in valid):
+        merged.binDataTime()
+    return merged
+
+
+def joinSpectra(spectra: List[CallistoSpectrogram]) -> (CallistoSpectrogram, List[int], List[List[int]]):
+    """
+    joins spectrograms with the same frequency channels in time, like joining them one by one with
+    CallistoSpectrogram.join_many(maxgap=None), but allocates the result once
+
+    every spectrogram is placed at its offset from the start of the first one and cut where the next one starts,
+    gaps are filled with the last value before the gap, as with joining one by one only the gap in front of the last
+    spectrogram is masked
+
+    :param spectra: spectrograms
+    :return: joined spectrogram (without header), position of each spectrogram, gaps as [index, number of values]
+    """
+    order = sorted(range(len(spectra)), key=lambda i: spectra[i].start)
+    specs = [spectra[i] for i in order]
+    first = specs[0]
+    if any(i.t_delt != first.t_delt for i in specs):
+        return CallistoSpectrogram.join_many(specs, maxgap=None), [0] * len(specs), []
+
+    day_start = datetime(first.start.year, first.start.month, first.start.day)
+    positions = [0]
+    for spec in specs[1:]:
+        day = datetime(spec.start.year, spec.start.month, spec.start.day)
+        t_init = (day - day_start).days * 24 * 3600 + spec.t_init
+        positions.append(int((t_init - first.t_init) / first.t_delt))
+    size = positions[-1] + specs[-1].shape[1]
+
+    data = np.empty((first.shape[0], size), dtype=np.result_type(*[i.data.dtype for i in specs]))
+    time_axis = np.empty(size)
+    gaps = []
+    for i, spec in enumerate(specs):
+        start = positions[i]
+        end = positions[i + 1] if i + 1 < len(specs) else size
+        width = min(end - start, spec.shape[1])
+        data[:, start:start + width] = spec.data[:, :width]
+        time_axis[start:start + width] = spec.time_axis[:width] + first.t_delt * start
+        if end - start > width:
+            gap = end - start - width
+            gaps.append([start + width, gap])
+            data[:, start + width:end] = spec.data[:, -1, np.newaxis]
+            time_axis[start + width:end] = spec.time_axis[-1] + first.t_delt * (start + np.arange(1, gap + 1))
+
+    if gaps and gaps[-1][0] + gaps[-1][1] == positions[-1]:
+        mask = np.zeros(data.shape, dtype=np.uint8)
+        mask[:, gaps[-1][0]:positions[-1]] = 1
+        data = np.ma.array(data, mask=mask)
+
+    instruments = set()
+    for spec in specs:
+        instruments |= spec.instruments
+    spectrum = CallistoSpectrogram(data, time_axis, first.freq_axis, first.start, specs[-1].end, first.t_init,
+                                   first.t_delt, first.t_label, first.f_label, first.content, instruments)
+    positions_input = [0] * len(spectra)
+    for i, position in zip(order, positions):
+        positions_input[i] = position
+    return spectrum, positions_input, gaps
+
+
 def frqProfile(_list: Union[DataPoint, List[DataPoint]]) -> str:
     """
     most frequent freq id of a list of datapoints
@@ -608,12 +1168,7 @@ def frqProfile(_list: Union[DataPoint, List[DataPoint]]) -> str:
     """
     if isinstance(_list, DataPoint):
         _list = [_list]
-    fa = []
-    for i in _list:
-        try:
-            fa.append(i.spectrum_data.header["FRQFILE"])
-        except KeyError:
-            pass
+    fa = [i.frq_file for i in _list if i.frq_file is not None]
     fsets = set(fa)
     count = [fa.count(i) for i in fsets]
     return list(fsets)[count.index(max(count))]
@@ -626,7 +1181,9 @@ def cutFreqProfile(_list: List[DataPoint], frq_profile: str) -> List[DataPoint]:
     :param frq_profile:
     :return:
     """
-    return [i for i in _list if (i.spectrum_data and i.spectrum_data.header["FRQFILE"] == frq_profile)]
+    data_profile = [i for i in _list if i.frq_file == frq_profile]
+    loader.loadDataPoints(data_profile)
+    return [i for i in data_profile if i.spectrum_data]
 
 
 def cutDayBefore(day: List[DataPoint], hour_limit: datetime) -> List[DataPoint]:
@@ -666,22 +1223,21 @@ def listDataPointDay(*date: Union[int, datetime], station: stations.Station) ->
     # download.downloadFullDay(date_ahead, station=station)
     # download.downloadFullDay(date_behind, station=station)
 
-    day_list = createDayList(date_, station=station)
-    date_ahead_list = createDayList(date_ahead, station=station)
-    date_behind_list = createDayList(date_behind, station=station)
+    day_list = createDayList(date_, station=station, lazy=True)
+    date_ahead_list = createDayList(date_ahead, station=station, lazy=True)
+    date_behind_list = createDayList(date_behind, station=station, lazy=True)
 
-    date_ahead_relevant = cutDayBefore(date_ahead_list, midnight)
-    date_behind_relevant = cutDayAfter(date_behind_list, midnight)
+    # only the last valid file before and the first valid file after the day get read
+    date_ahead_relevant = next(([i] for i in reversed(cutDayBefore(date_ahead_list, midnight)) if i), [])
+    date_behind_relevant = next(([i] for i in cutDayAfter(date_behind_list, midnight) if i), [])
 
     if date_ahead_relevant and date_behind_relevant:
-        date_ahead_relevant = [date_ahead_relevant[-1]]
         frq_profile_1st = frqProfile(date_ahead_list)
         frq_profile_2nd = frqProfile(day_list)
         if frq_profile_1st == frq_profile_2nd:
             date_ahead_relevant.extend(cutDayAfter(day_list, midnight))
 
         day_list = cutDayBefore(day_list, midnight)
-        date_behind_relevant = [date_behind_relevant[0]]
 
         frq_profile_3rd = frqProfile(date_behind_relevant)
         if frq_profile_2nd == frq_profile_3rd:
@@ -690,13 +1246,14 @@ def listDataPointDay(*date: Union[int, datetime], station: stations.Station) ->
         date_ahead_relevant = cutFreqProfile(date_ahead_relevant, frqProfile(date_ahead_relevant))
         day_list = cutFreqProfile(day_list, frqProfile(day_list))
 
-        return [date_ahead_relevant, day_list]
+        return [i for i in [date_ahead_relevant, day_list] if i]
 
     if not day_list:
         return []
 
     frq_profile = frqProfile(day_list)
-    return [cutFreqProfile(day_list, frq_profile)]
+    day_list = cutFreqProfile(day_list, frq_profile)
+    return [day_list] if day_list else []
 
 
 def listDataPointDayEuropeUT(*date: Union[int, datetime], station: stations.Station) -> List[List[DataPoint]]:
@@ -707,11 +1264,12 @@ def listDataPointDayEuropeUT(*date: Union[int, datetime], station: stations.Stat
     """
     print(station)
     date_ = config.getDateFromArgs(*date)
-    day_list = createDayList(date_, station=station)
+    day_list = createDayList(date_, station=station, lazy=True)
     day_list_EU_UT = [file for file in day_list if config.EU_time_lower <= file.hour < config.EU_time_upper]
     try:
         frq_profile = frqProfile(day_list_EU_UT)
-        return [cutFreqProfile(day_list_EU_UT, frq_profile)]
+        day_list_EU_UT = cutFreqProfile(day_list_EU_UT, frq_profile)
+        return [day_list_EU_UT] if day_list_EU_UT else []
     except ValueError:
         return []
 
@@ -741,8 +1299,8 @@ def fitTimeFrameDataSample(_data_point1, _data_point2):
                 _data_point2.pop(-1)
     except IndexError:
         return [], []
-    data_merged1 = sum(_data_point1)
-    data_merged2 = sum(_data_point2)
+    data_merged1 = mergeDataPoints(_data_point1)
+    data_merged2 = mergeDataPoints(_data_point2)
     return data_merged1, data_merged2
 
 
@@ -16,6 +16,7 @@ from typing import List, Union, Tuple
 import io
 
 import config
+import manifest
 import stations
 
 file_log = ".datalog"
@@ -119,19 +120,20 @@ def createLog(*date: datetime.datetime, station: List[str], _overwrite=True):
         with open(path_log + file_log, "w+") as datalog:
             print("1", path_log + file_log)
             print(os.path.exists(path_log + file_log))
-            writeLog(datalog, path_log, station)
+            writeLog(datalog, date_, station)
     else:
         with open(path_log + file_log, "a+") as datalog:
-            writeLog(datalog, path_log, station)
+            writeLog(datalog, date_, station)
     print("3")
     print(os.path.exists(path_log + file_log))
+    invalidateAvailability(date_)
 
 
-def writeLog(datalog: io.IOBase, path_log: str, station: List[str]):
-    files = os.listdir(path_log)
+def writeLog(datalog: io.IOBase, date: datetime.datetime, station: List[str]):
+    stations_day = manifest.getManifest(date).stations()
     for station_ in station:
         print(station_)
-        if any(file.startswith(station_ + stations.seperator) for file in files):
+        if station_ in stations_day:
             datalog.write(station_ + " ")
         else:
             print("2")
@@ -150,6 +152,24 @@ def dataAvailable(*date) -> Tuple[bool, Union[None, List[str]]]:
     date_ = config.getDateFromArgs(*date)
 
     path_log = config.pathDataDay(date_)
+    if path_log not in dataAvailable.registry:
+        dataAvailable.registry[path_log] = readLog(path_log)
+    data_available, station = dataAvailable.registry[path_log]
+    if station is None:
+        return data_available, None
+    return data_available, list(station)
+
+
+dataAvailable.registry = {}
+
+
+def readLog(path_log: str) -> Tuple[bool, Union[None, List[str]]]:
+    """
+    reads the log file of a day folder, use dataAvailable() instead
+
+    :param path_log: day folder
+    :return: bool, list[str] observatories for which data is available
+    """
     if not os.path.exists(path_log):
         return False, None
     try:
@@ -163,6 +183,40 @@ def dataAvailable(*date) -> Tuple[bool, Union[None, List[str]]]:
         return False, None
 
 
+def invalidateAvailability(*date) -> None:
+    """
+    forces dataAvailable() to read the log file of a day again, called whenever the log gets written
+
+    :param date: datetime, integer: year, month, day, empty for all days
+    """
+    if not date:
+        dataAvailable.registry.clear()
+        return
+    date_ = config.getDateFromArgs(*date)
+    dataAvailable.registry.pop(config.pathDataDay(date_), None)
+
+
+def prefetchDay(*date: Union[datetime.datetime, int],
+                station: Union[str, stations.Station, List[str], List[stations.Station]]) -> None:
+    """
+    downloads the files of stations that are missing for a day, if the day was downloaded before,
+    so reading the files afterwards only needs local files
+
+    :param date: datetime, integer: year, month, day
+    :param station: name-codes|Stations
+    """
+    date_ = config.getDateFromArgs(*date)
+    data_available, stations_old = dataAvailable(date_)
+    if not data_available:
+        return
+    if not isinstance(station, list):
+        station = [station]
+    names = [i.name if isinstance(i, stations.Station) else i for i in station]
+    missing = [i for i in names if i not in stations_old]
+    if missing:
+        downloadFullDay(date_, station=missing)
+
+
 def stationsAvailable(*date) -> Tuple[bool, List[str]]:
     """
     checks whether data is available for a certain day in the local folder,
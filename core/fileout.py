@@ -5,6 +5,7 @@ import datetime
 import os
 import shutil
 import json 
+from typing import List, Union
 
 import config
 import analysis
@@ -65,12 +66,12 @@ def saveJson(eventlist: events.EventList) -> None:
         json.dump(json_data, file, indent=4)
 
 
-def saveplots(eventlist: events.EventList) -> None:
+def saveplots(eventlist: events.EventList, data_sets: Union[List[data.DataPoint], None] = None) -> None:
     for event in eventlist:
         folder = foldername(event)
         os.makedirs(folder, exist_ok=True)
         for stat in event.stations:
-            dp = data.createFromEvent(event, stat)
+            dp = data.createFromEvent(event, stat, data_sets=data_sets)
             analysis.plotDatapoint(dp, save_img=True, folder=folder, short_name=True)
 
 
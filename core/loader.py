@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - loader.py -
+
+parallel loading of DataPoints: files that aren't in the decoded spectrum cache get decoded, cleaned up and checked
+in worker processes, the spectra come back in shared memory segments instead of pickled arrays.
+the workers keep their segments open until the main process has mapped them (on windows a segment is gone as soon as
+its last handle is closed)
+whether the pool is faster than loading in the main process is unmeasured, it is off by default (config.load_workers)
+low level
+"""
+
+import atexit
+import multiprocessing
+import multiprocessing.pool
+import os
+from multiprocessing import resource_tracker, shared_memory
+from typing import Tuple, Union
+
+import numpy as np
+
+import cache
+import config
+import data
+
+
+class SharedArray(np.ndarray):
+    """
+    ndarray on a shared memory segment, keeps the segment mapped as long as the array or a view of it exists
+    """
+    def __array_finalize__(self, obj):
+        segment = getattr(obj, "_segment", None)
+        if segment is not None and np.may_share_memory(self, obj):
+            self._segment = segment
+        else:
+            self._segment = None
+
+
+def attachArray(name: str, shape: Tuple[int, ...], dtype: str) -> SharedArray:
+    """
+    maps a shared memory segment created by a worker and removes its name, the memory gets freed as soon as the
+    array and all views of it are gone
+
+    :param name: name of the segment
+    :param shape: shape of the array
+    :param dtype: dtype string of the array
+    :return: array on the segment
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf).view(SharedArray)
+    array._segment = segment
+    segment.unlink()
+    return array
+
+
+def initWorker(settings: dict, barrier: multiprocessing.Barrier) -> None:
+    """
+    applies the settings of config of the main process, in case the workers get spawned instead of forked
+
+    :param settings: values of config
+    :param barrier: for releaseSegments(), one party per worker
+    """
+    for key, value in settings.items():
+        setattr(config, key, value)
+    releaseSegments.barrier = barrier
+
+
+def loadFile(file: str, debug: bool) -> tuple:
+    """
+    worker: loads a single DataPoint and moves its spectrum into a new shared memory segment
+
+    :param file: file name
+    :param debug: passed to DataPoint
+    :return: DataPoint without spectrum, name, shape and dtype of the segment (None if loading failed)
+    """
+    data_point = data.DataPoint(file, debug=debug, lazy=True)
+    if data_point.spectrum_data is None:
+        return data_point, None, (), ""
+
+    array = np.ascontiguousarray(data_point.spectrum_data.data)
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    data_point.spectrum_data.data = None
+    # stays open until the main process has mapped it (see releaseSegments())
+    loadFile.segments.append(segment)
+    return data_point, segment.name, array.shape, array.dtype.str
+
+
+loadFile.segments = []
+
+
+def releaseSegments(_) -> None:
+    """
+    worker: closes the segments of loadFile() after the main process has mapped them, one call per worker: the
+    barrier keeps a worker from taking the call of another one
+    """
+    for segment in loadFile.segments:
+        segment.close()
+    loadFile.segments = []
+    releaseSegments.barrier.wait()
+
+
+releaseSegments.barrier = None
+
+
+def getPool(workers: int) -> multiprocessing.pool.Pool:
+    """
+    process pool of the loader, reused as long as the number of workers doesn't change
+
+    :param workers: number of worker processes
+    :return: pool
+    """
+    if getPool.pool is not None and getPool.workers == workers:
+        return getPool.pool
+    closePool()
+    # workers have to share the resource tracker of the main process, otherwise segments get unlinked twice
+    resource_tracker.ensure_running()
+    settings = {key: value for key, value in vars(config).items()
+                if not key.startswith("_") and isinstance(value, (bool, int, float, str))}
+    getPool.pool = multiprocessing.Pool(workers, initializer=initWorker,
+                                        initargs=(settings, multiprocessing.Barrier(workers)))
+    getPool.workers = workers
+    return getPool.pool
+
+
+getPool.pool = None
+getPool.workers = None
+
+
+@atexit.register
+def closePool() -> None:
+    """
+    shuts down the process pool of the loader
+    """
+    if getPool.pool is not None:
+        getPool.pool.close()
+        getPool.pool.join()
+        getPool.pool = None
+
+
+def loadDataPoints(data_points: list, workers: Union[int, None] = None) -> None:
+    """
+    loads lazy DataPoints in place, DataPoints that are loaded already get skipped
+
+    files in the decoded spectrum cache get loaded in this process, memory mapped (see cache.loadEntry()),
+    only the files that have to be decoded go to the worker processes
+
+    :param data_points: List[data.DataPoint], lazy DataPoints
+    :param workers: number of worker processes, default: config.load_workers, 0 or 1 loads in this process
+    """
+    if workers is None:
+        workers = config.load_workers
+    to_load = [i for i in data_points if not i.loaded]
+    if workers >= 2:
+        cached = [cache.isCached(os.path.join(i.path + i.file_name)) for i in to_load]
+        for data_point in [i for i, j in zip(to_load, cached) if j]:
+            data_point.load()
+        to_load = [i for i, j in zip(to_load, cached) if not j]
+    if not to_load:
+        return
+    if workers < 2 or len(to_load) < 2:
+        for data_point in to_load:
+            data_point.load()
+        return
+
+    pool = getPool(workers)
+    results = pool.starmap(loadFile, [(i.file_name, i.debug) for i in to_load])
+    try:
+        for data_point, (result, name, shape, dtype) in zip(to_load, results):
+            if name is not None:
+                result.spectrum_data.data = attachArray(name, shape, dtype)
+            result.lazy = data_point.lazy
+            data_point.__dict__.update(result.__dict__)
+    finally:
+        pool.map(releaseSegments, range(workers), chunksize=1)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - manifest.py -
+
+per day index of the local e-Callisto files: station, focus code, start time, FRQFILE and frequency limits of every
+file, sorted and persisted, so lookups don't need os.listdir() and filename scans
+low level
+"""
+
+import bisect
+import datetime
+import json
+import os
+import warnings
+from typing import List, Union
+
+import config
+import metadata
+import stations
+
+folder_manifest = "manifest"
+
+FILE = 0
+STATION = 1
+FOCUS_CODE = 2
+TIME = 3
+FRQ_FILE = 4
+FRQ_LOW = 5
+FRQ_HIGH = 6
+
+
+class Manifest:
+    """
+    sorted list of all e-Callisto files in a day folder, entries: [file, station, focus_code, time, frq_file,
+    frq_low, frq_high], time in seconds of the day
+    """
+    def __init__(self, path: str, mtime: int, entries: List[list]):
+        """
+        :param path: day folder
+        :param mtime: modification time of the folder (ns) when the manifest was built
+        :param entries: one entry per file
+        """
+        self.path = path
+        self.mtime = mtime
+        self.entries = sorted(entries, key=lambda entry: (entry[STATION], entry[FOCUS_CODE], entry[TIME], entry[FILE]))
+        self.index = {}
+        for entry in self.entries:
+            self.index.setdefault((entry[STATION], entry[FOCUS_CODE]), []).append(entry)
+        self.times = {key: [entry[TIME] for entry in value] for key, value in self.index.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stations(self) -> List[str]:
+        """
+        :return: sorted names of all stations with files in the folder
+        """
+        return sorted(set(entry[STATION] for entry in self.entries))
+
+    def files(self, station: str, focus_code: Union[str, None] = None) -> List[str]:
+        """
+        files of a station sorted by start time
+
+        :param station: name of the station
+        :param focus_code: optional, only files with this focus code
+        :return: file names
+        """
+        if focus_code is not None:
+            return [entry[FILE] for entry in self.index.get((station, focus_code), [])]
+        return [entry[FILE] for entry in self.entries if entry[STATION] == station]
+
+    def fileAtTime(self, station: str, focus_code: str, time: int) -> int:
+        """
+        binary search for the first file of a station that covers a time, i.e. starts less than
+        config.LENGTH_FILES_MINUTES before it
+
+        :param station: name of the station
+        :param focus_code:
+        :param time: seconds of the day
+        :return: index in files(station, focus_code), -1 if no file covers time
+        """
+        times = self.times.get((station, focus_code), [])
+        i = bisect.bisect_right(times, time - config.LENGTH_FILES_MINUTES * 60)
+        if i < len(times) and times[i] <= time:
+            return i
+        return -1
+
+    def entry(self, station: str, focus_code: str, i: int) -> list:
+        """
+        :return: i-th entry of a station and focus code
+        """
+        return self.index[(station, focus_code)][i]
+
+    def focusCode(self, station: str) -> str:
+        """
+        first focus code of a station with a frequency range accepted by config.frq_limit_*
+
+        :param station: name of the station
+        :return: focus code
+        """
+        for entry in self.entries:
+            if entry[STATION] != station or entry[FRQ_LOW] is None:
+                continue
+            if config.frq_limit_low_upper > entry[FRQ_LOW] > config.frq_limit_low_lower and \
+                    config.frq_limit_high_upper > entry[FRQ_HIGH] > config.frq_limit_high_lower:
+                return entry[FOCUS_CODE]
+        raise ValueError("No valid focus code for that day")
+
+
+def getManifest(*date: Union[int, datetime.datetime]) -> Manifest:
+    """
+    manifest of a day folder, gets rebuilt as soon as the modification time of the folder changes
+
+    :param date: datetime, integer: year, month, day
+    :return: Manifest
+    """
+    date_ = config.getDateFromArgs(*date)
+    path = config.pathDataDay(date_)
+    mtime = os.stat(path).st_mtime_ns
+
+    manifest = getManifest.manifests.get(path)
+    if manifest is not None and manifest.mtime == mtime:
+        return manifest
+
+    manifest_old = loadManifest(date_)
+    if manifest_old is not None and manifest_old.mtime == mtime and manifest_old.path == path:
+        manifest = manifest_old
+    else:
+        manifest = buildManifest(path, mtime, manifest_old)
+        try:
+            saveManifest(date_, manifest)
+        except OSError:
+            warnings.warn(message=f"could not save manifest of {path}", category=UserWarning)
+    getManifest.manifests[path] = manifest
+    return manifest
+
+
+getManifest.manifests = {}
+
+
+def buildManifest(path: str, mtime: int, manifest_old: Union[Manifest, None] = None) -> Manifest:
+    """
+    creates the manifest of a folder, reuses the entries of an outdated manifest for files that are still there
+
+    :param path: day folder
+    :param mtime: modification time of the folder (ns)
+    :param manifest_old: outdated manifest of the folder
+    :return: Manifest
+    """
+    entries_old = {}
+    if manifest_old is not None:
+        entries_old = {entry[FILE]: entry for entry in manifest_old.entries}
+
+    entries = []
+    for file in os.listdir(path):
+        if file in entries_old:
+            entries.append(entries_old[file])
+            continue
+        entry = readEntry(path, file)
+        if entry is not None:
+            entries.append(entry)
+    return Manifest(path, mtime, entries)
+
+
+def readEntry(path: str, file: str) -> Union[list, None]:
+    """
+    manifest entry of a single file
+
+    :param path: day folder
+    :param file: file name
+    :return: entry, None if the file is not an e-Callisto file
+    """
+    if not file.endswith(config.file_ending):
+        return None
+    station = stations.getNameFcFromFile(file)[0]
+    if station is None:
+        return None
+    try:
+        time_read = file.rsplit(stations.seperator)[-2]
+        time = int(time_read[:2]) * 3600 + int(time_read[2:4]) * 60 + int(time_read[4:6])
+    except ValueError:
+        return None
+    focus_code = file.rsplit(stations.seperator)[-1][:-len(config.file_ending)]
+
+    try:
+        values = metadata.getMetadata(os.path.join(path, file))
+    except OSError:
+        return None
+    return [file, station, focus_code, time, values["frq_file"], values["frq_low"], values["frq_high"]]
+
+
+def pathManifest(*date: Union[int, datetime.datetime]) -> str:
+    """
+    :param date: datetime, integer: year, month, day
+    :return: path of the saved manifest of a day
+    """
+    date_ = config.getDateFromArgs(*date)
+    return os.path.join(config.path_cache, folder_manifest, f"{date_.year}_{date_.month:02}_{date_.day:02}.json")
+
+
+def saveManifest(date: datetime.datetime, manifest: Manifest) -> None:
+    """
+    saves the manifest of a day outside of the day folder, so saving it doesn't change the folders modification time
+    """
+    os.makedirs(os.path.join(config.path_cache, folder_manifest), exist_ok=True)
+    file_name = pathManifest(date)
+    with open(file_name + f".{os.getpid()}.tmp", "w") as file:
+        json.dump({"path": manifest.path, "mtime": manifest.mtime, "entries": manifest.entries}, file)
+    os.replace(file_name + f".{os.getpid()}.tmp", file_name)
+
+
+def loadManifest(date: datetime.datetime) -> Union[Manifest, None]:
+    """
+    :return: saved manifest of a day, None if there is none
+    """
+    try:
+        with open(pathManifest(date), "r") as file:
+            content = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return Manifest(content["path"], content["mtime"], content["entries"])
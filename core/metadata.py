@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - metadata.py -
+
+persistent cache of the fits header values of e-Callisto files (location, frequency range, FRQFILE, start and end,
+size of the data), so station discovery doesn't have to open files that were already seen
+low level
+"""
+
+import os
+import sqlite3
+from typing import Union
+
+from astropy.io import fits
+
+import cache
+import config
+
+file_database = "metadata.sqlite"
+
+columns = ["obs_lat", "obs_lac", "obs_lon", "obs_loc", "frq_low", "frq_high", "frq_file",
+           "date_obs", "time_obs", "date_end", "time_end", "n_samples", "n_freq", "bitpix", "corrupt"]
+
+
+def connect() -> sqlite3.Connection:
+    """
+    connection to the metadata database of this process, creates the database if necessary
+
+    :return: connection
+    """
+    path = os.path.join(config.path_cache, file_database)
+    if connect.connection is not None and connect.pid == os.getpid() and connect.path == path:
+        return connect.connection
+
+    os.makedirs(config.path_cache, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, "
+                       + ", ".join(columns) + ")")
+    connection.commit()
+    connect.connection = connection
+    connect.pid = os.getpid()
+    connect.path = path
+    return connection
+
+
+connect.connection = None
+connect.pid = None
+connect.path = None
+
+
+def getMetadata(file: str) -> dict:
+    """
+    header values of a local e-Callisto file, only reads the file if it isn't in the database or changed since
+
+    :param file: path to the file
+    :return: dict with the keys of columns, values that couldn't be read are None
+    """
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    try:
+        connection = connect()
+        row = connection.execute("SELECT " + ", ".join(columns) + " FROM files WHERE path=? AND size=? AND mtime=?",
+                                 (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+    except sqlite3.Error:
+        return readMetadata(path)
+    if row is not None:
+        return dict(zip(columns, row))
+
+    values = readMetadata(path)
+    try:
+        connection.execute("INSERT OR REPLACE INTO files VALUES (" + ", ".join(["?"] * (len(columns) + 3)) + ")",
+                           [path, stat.st_size, stat.st_mtime_ns] + [values[i] for i in columns])
+        connection.commit()
+    except sqlite3.Error:
+        pass
+    return values
+
+
+def readMetadata(file: str) -> dict:
+    """
+    reads the header values of an e-Callisto file, opens it only once
+
+    :param file: path or url to the file
+    :return: dict with the keys of columns, values that couldn't be read are None
+    """
+    values = dict.fromkeys(columns)
+    values["corrupt"] = False
+    try:
+        with fits.open(file) as fds:
+            header = fds[0].header
+            cache.normalizeHeader(header)
+            for key in ["OBS_LAT", "OBS_LAC", "OBS_LON", "OBS_LOC", "FRQFILE",
+                        "DATE-OBS", "TIME-OBS", "DATE-END", "TIME-END", "NAXIS1", "NAXIS2", "BITPIX"]:
+                value = header.get(key)
+                if isinstance(value, (int, float, str)):
+                    values[columnName(key)] = value
+            frq_axis = fds[1].data['frequency'].flatten()
+            frq = sorted([float(frq_axis[0]), float(frq_axis[-1])])
+            values["frq_low"], values["frq_high"] = frq
+    except (OSError, IndexError, KeyError, TypeError, AttributeError, ValueError):
+        values["corrupt"] = True
+    return values
+
+
+def columnName(key: str) -> str:
+    """
+    :param key: fits header keyword
+    :return: column of the keyword in the database
+    """
+    return {"NAXIS1": "n_samples", "NAXIS2": "n_freq", "FRQFILE": "frq_file"}.get(key, key.lower().replace("-", "_"))
+
+
+def location(values: dict) -> (Union[float, None], Union[float, None]):
+    """
+    :param values: metadata of a file
+    :return: longitude, latitude with sign (east, north positive), None if not in the header
+    """
+    if values["obs_lat"] is None or values["obs_lon"] is None:
+        return None, None
+    lat = -values["obs_lat"] if values["obs_lac"] == 'S' else values["obs_lat"]
+    lon = -values["obs_lon"] if values["obs_loc"] == 'W' else values["obs_lon"]
+    return lon, lat
+
+
+def validFrequencyRange(values: dict) -> bool:
+    """
+    :param values: metadata of a file
+    :return: whether the frequency range is accepted by config.frq_limit_*
+    """
+    if values["frq_low"] is None:
+        return False
+    return config.frq_limit_low_upper > values["frq_low"] > config.frq_limit_low_lower and \
+        config.frq_limit_high_upper > values["frq_high"] > config.frq_limit_high_lower
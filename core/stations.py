@@ -11,7 +11,6 @@ low level
 
 
 from typing import List, Union
-from astropy.io import fits
 import urllib
 from bs4 import BeautifulSoup
 import os
@@ -19,6 +18,8 @@ import warnings
 import datetime
 
 import config
+import manifest
+import metadata
 
 e_callisto_url = config.e_callisto_url
 seperator = "_"
@@ -96,17 +97,7 @@ def getFocusCode(*date: Union[int, datetime.datetime], station: str) -> str:
     :return:
     """
     date_ = config.getDateFromArgs(*date)
-
-    files = os.listdir(config.pathDataDay(date_))
-    files_station = [i for i in files if i.startswith(station + seperator)]
-    for i in files_station:
-        file = fits.open(config.pathDataDay(date_) + i)
-        frq_axis = file[1].data['frequency'].flatten()
-        frq = sorted([frq_axis[0], frq_axis[-1]])
-        if config.frq_limit_low_upper > frq[0] > config.frq_limit_low_lower and \
-                config.frq_limit_high_upper > frq[1] > config.frq_limit_high_lower:
-            return i.rsplit(seperator)[-1].rstrip(config.file_ending)
-    raise ValueError("No valid focus code for that day")
+    return manifest.getManifest(date_).focusCode(station)
 
 
 def listFilesDay(source: str, offline=False):
@@ -166,10 +157,11 @@ def getStations(*date: Union[int, datetime.datetime], offline: bool = False) ->
     date_ = config.getDateFromArgs(*date)
     if offline:
         source = config.pathDataDay(date_)
+        manifest_day = manifest.getManifest(date_)
     else:
         date_str = "{:%Y/%m/%d}".format(date_)
         source = os.path.join(e_callisto_url, date_str)
-        
+
     files = listFilesDay(source, offline=offline)
     stations = []
     stations_return = []
@@ -184,79 +176,41 @@ def getStations(*date: Union[int, datetime.datetime], offline: bool = False) ->
     for i in stations_clean:
         name = i[0]
         focus_code = i[1]
-        for a, b in enumerate(listFD(source, i, offline=offline)):
+        if offline:
+            files_station = [os.path.join(source, file) for file in manifest_day.files(name, focus_code)]
+        else:
+            files_station = listFD(source, i, offline=offline)
+        for b in files_station:
             try:
-                with fits.open(b) as fds:
-                    try:
-                        lat = fds[0].header['OBS_LAT']
-                        lac = fds[0].header['OBS_LAC']
-                        if lac == 'S':
-                            lat_ = -lat
-                        else:
-                            lat_ = lat
-                        lon = fds[0].header['OBS_LON']
-                        loc = fds[0].header['OBS_LOC']
-                        if loc == 'W':
-                            lon_ = -lon
-                        else:
-                            lon_ = lon
-                        frq_axis = fds[1].data['frequency'].flatten()
-                        frq = sorted([frq_axis[0], frq_axis[-1]])
-                        if config.frq_limit_low_upper > frq[0] > config.frq_limit_low_lower and \
-                                config.frq_limit_high_upper > frq[1] > config.frq_limit_high_lower:
-                            station = Station(name, focus_code, lon_, lat_, frq)
-                            stations_return.append(station)
-                    except (IndexError, KeyError, TypeError, AttributeError):
-                        warnings.warn(message=f"Could not read fits file of {b}",
-                                      category=UserWarning)
-                    break
+                values = metadata.getMetadata(b) if offline else metadata.readMetadata(b)
             except OSError:
                 continue
+            if values["corrupt"]:
+                continue
+            lon, lat = metadata.location(values)
+            if lon is None:
+                warnings.warn(message=f"Could not read fits file of {b}", category=UserWarning)
+            elif metadata.validFrequencyRange(values):
+                stations_return.append(Station(name, focus_code, lon, lat, [values["frq_low"], values["frq_high"]]))
+            break
     return stations_return
 
 
 def getStationFromFile(file: str) -> Station:
     """
-    creates Station object from filename
+    creates Station object from filename, raises AttributeError if the frequency range of the file is not accepted
     :param file:
     """
     name, focus_code = getNameFcFromFile(file)
     if name is None:
         raise AttributeError("cannot read file", file)
-    try:
-        with fits.open(file) as fds:
-            lat = fds[0].header['OBS_LAT']
-            lac = fds[0].header['OBS_LAC']
-            if lac == 'S':
-                lat = -lat
-            lon = fds[0].header['OBS_LON']
-            loc = fds[0].header['OBS_LOC']
-            if loc == 'W':
-                lon = -lon
-    except IndexError:
-        warnings.warn(message=f"failed to open {file}", category=UserWarning)
-        return Station(name, focus_code=focus_code)
-    except KeyError:
-        warnings.warn(message=f" {file}", category=UserWarning)
-        return Station(name, focus_code=focus_code)
-    except OSError:
+    values = metadata.getMetadata(file)
+    if values["corrupt"]:
         warnings.warn(message=f"corrupt file {file}", category=UserWarning)
         return Station(name, focus_code=focus_code)
-    finally:
-        try:
-            with fits.open(file) as fds:
-                frq_axis = fds[1].data["frequency"].flatten()
-                frq = sorted([frq_axis[0], frq_axis[-1]])
-                if config.frq_limit_low_upper > frq[0] > config.frq_limit_low_lower and \
-                        config.frq_limit_high_upper > frq[1] > config.frq_limit_high_lower:
-                    return Station(name, focus_code, lon, lat, frq)
-                raise AttributeError("Station in file has wrong frequency range.")
-        except IndexError:
-            warnings.warn(message=f"failed to open {file}", category=UserWarning)
-            return Station(name, focus_code=focus_code)
-        except KeyError:
-            return Station(name, focus_code=focus_code)
-        except OSError:
-            warnings.warn(message=f"corrupt file {file}", category=UserWarning)
-            return Station(name, focus_code=focus_code)
-        
\ No newline at end of file
+    if not metadata.validFrequencyRange(values):
+        raise AttributeError("Station in file has wrong frequency range.")
+    lon, lat = metadata.location(values)
+    if lon is None:
+        warnings.warn(message=f" {file}", category=UserWarning)
+    return Station(name, focus_code, lon, lat, [values["frq_low"], values["frq_high"]])
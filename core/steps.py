@@ -16,6 +16,7 @@ import warnings
 import datetime
 
 import config
+import curves
 import download
 import stations
 import analysis
@@ -23,16 +24,24 @@ import events
 import data
 
 
-def dataSetDay(*date: Union[datetime.datetime, int], run: bool = False, eu_ut: bool = False) -> List[data.DataPoint]:
+def dataSetDay(*date: Union[datetime.datetime, int], run: bool = False, eu_ut: bool = False,
+               curves_only: bool = False) -> List[data.DataPoint]:
     """
     creates a list of the longest continuous timeframes for all stations for a specific day
 
     :param date: 
     :param run: True: also searches local files | False: searches external files on the server, downloads missing files
     :param eu_ut: restricts calculation time to 08:00-17:00 UT
+    :param curves_only: returns the DataPoints of an earlier run without spectra if the day is in the curve store,
+        firstStep() with the same curve parameters runs from the stored curves then (see curves.py)
     :return: List[data.DataPoint]
     """
     date_ = config.getDateFromArgs(*date)
+    if curves_only:
+        sets = curves.loadDataSets(date_, eu_ut)
+        if sets is not None:
+            print(f"\n{len(sets)} DataPoints of {date_.year} {date_.month:02} {date_.day:02} from the curve store")
+            return sets
     if run:
         print(f"\nGetting Stations for 1st Step: {date_.year} {date_.month:02} {date_.day:02}")
         observatories = stations.getStations(date_, offline=True)
@@ -40,13 +49,19 @@ def dataSetDay(*date: Union[datetime.datetime, int], run: bool = False, eu_ut: b
         observatories = stations.getStations(date_, offline=False)
         download.downloadFullDay(date_, station=observatories)
     print(len(observatories), "observatories found")
+    # all downloads happen here, reading the files is local only
+    days = [date_] if eu_ut else [date_ - datetime.timedelta(days=1), date_, date_ + datetime.timedelta(days=1)]
+    for day in days:
+        download.prefetchDay(day, station=observatories)
     sets = []
     for j in observatories:
         if eu_ut:
             sets.extend(data.listDataPointDayEuropeUT(date_, station=j))
         else:
             sets.extend(data.listDataPointDay(date_, station=j))
-    sets_summed = [sum(i) for i in sets]
+    sets_summed = [data.mergeDataPoints(i) for i in sets]
+    if config.curve_store:
+        curves.storeDataSets(date_, eu_ut, sets_summed)
     return sets_summed
 
 
@@ -76,29 +91,48 @@ def firstStep(*date: Union[datetime.datetime, int], data_sets: List[data.DataPoi
         limit = config.correlation_start
     else:
         limit = limit
-    perm_abs = int(len(data_sets) * (len(data_sets) - 1) / 2)
-    perm = 0
-    print(perm_abs, "permutations to go")
-    e_list = events.EventList([], date_)
-    for i, data_point_1 in enumerate(data_sets):
-        print(f"Start permutations of {data_point_1.observatory} ({perm+1:6} / {perm_abs:6})", end="\r")
-        for j, data_point_2 in enumerate(data_sets[i + 1:]):
-            perm += 1
-            data1 = copy.deepcopy(data_point_1)
-            data2 = copy.deepcopy(data_point_2)
-            if data1 and data2:
-                dp1, dp2, corr = analysis.calcPoint(date_, obs1=data1.observatory, obs2=data2.observatory,
-                                                    data_point_1=data1, data_point_2=data2, limit=limit,
-                                                    no_bg=nobg, bin_freq=bin_f, bin_time=bin_t,
-                                                    flatten=flatten, bin_time_width=bin_t_w, mask_frq=mask_frq,
-                                                    flatten_window=flatten_w, r_window=r_w)
-                try:
-                    if corr.peaks:
-                        e_list += corr.peaks
-                except AttributeError:
+    if config.batch_correlation:
+        e_list = analysis.calcPairs(date_, data_sets=data_sets, limit=limit, mask_frq=mask_frq, no_bg=nobg,
+                                    bin_freq=bin_f, bin_time=bin_t, flatten=flatten, bin_time_width=bin_t_w,
+                                    flatten_window=flatten_w, r_window=r_w, curve_store=config.curve_store)
+    else:
+        frequency_index = not (mask_frq or nobg or bin_f or bin_t or config.curve_store)
+        if frequency_index:
+            # the spectra stay as they are for every pair, the summed curves of all frequency ranges of a station
+            # can come from one index, as long as it stays in the registry of derived products
+            for data_point in data_sets:
+                if data_point and not data_point.curves_only:
+                    data_point.createFrequencyIndex()
+        perm_abs = int(len(data_sets) * (len(data_sets) - 1) / 2)
+        perm = 0
+        print(perm_abs, "permutations to go")
+        e_list = events.EventList([], date_)
+        for i, data_point_1 in enumerate(data_sets):
+            print(f"Start permutations of {data_point_1.observatory} ({perm+1:6} / {perm_abs:6})", end="\r")
+            for j, data_point_2 in enumerate(data_sets[i + 1:]):
+                perm += 1
+                data1 = copy.copy(data_point_1)
+                data2 = copy.copy(data_point_2)
+                if data1 and data2:
+                    result = analysis.calcPoint(date_, obs1=data1.observatory, obs2=data2.observatory,
+                                                data_point_1=data1, data_point_2=data2, limit=limit,
+                                                no_bg=nobg, bin_freq=bin_f, bin_time=bin_t,
+                                                flatten=flatten, bin_time_width=bin_t_w, mask_frq=mask_frq,
+                                                flatten_window=flatten_w, r_window=r_w, curve_store=config.curve_store)
+                    if result is None:
+                        continue
+                    dp1, dp2, corr = result
+                    try:
+                        if corr.peaks:
+                            e_list += corr.peaks
+                    except AttributeError:
+                        pass
+                else:
                     pass
-            else:
-                pass
+        if frequency_index:
+            for data_point in data_sets:
+                if data_point:
+                    data_point.dropFrequencyIndex()
     try:
         e_list.sort()
     except AttributeError:
@@ -111,7 +145,7 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
                mask_freq: bool or None = True, no_bg: bool or None = True, bin_f: bool or None = False,
                bin_t: bool or None = True, bin_t_w: int or None = None,
                flatten: bool or None = True, flatten_w: int or None = None,
-               r_w: int = 30) -> events.EventList:
+               r_w: int = 30, data_sets: List[data.DataPoint] or None = None) -> events.EventList:
     """
     first verification step with correlation method,
     smaller timeframe (3 minutes around bursts)
@@ -127,6 +161,8 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
     :param flatten: toggle median subtraction
     :param flatten_w: rolling window size for median subtraction
     :param r_w: rolling window for correlation method
+    :param data_sets: optional, DataPoints of the day (see dataSetDay()), the events get cut out of them instead of
+        reading the files again
     :return:
     """
     date_ = config.getDateFromArgs(*date)
@@ -148,8 +184,8 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
         for i in set_obs:
             print(i)
             try:
-                d1 = data.createFromEvent(event, station=i[0])
-                d2 = data.createFromEvent(event, station=i[1])
+                d1 = data.createFromEvent(event, station=i[0], data_sets=data_sets)
+                d2 = data.createFromEvent(event, station=i[1], data_sets=data_sets)
                 if d1.spectrum_data is None or d2.spectrum_data is None:
                     continue
                 dp1, dp2, cor = analysis.calcPoint(event.time_start, obs1=i[0], obs2=i[1],
@@ -161,6 +197,7 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
                 # TODO maybe different values (1)
                 # increase threshold, when correlation is too high for the timeframe 
                 #   filters too strong with these values
+                #   calcPoint() already found the peaks for limit, bursts for a new limit: cor.peaksLimits()
                 
                 if np.nanmean(cor.data_curve) > config.correlation_noise_limit_high:
                     cor.peaks = events.EventList([], event.time_start)
@@ -169,7 +206,6 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
                     cor.peaks = events.EventList([], event.time_start)
                     limit = config.correlation_limit_low_noise
                 """
-                cor.calculatePeaks(limit=limit)
 
                 if dp1 is None:
                     continue
@@ -192,8 +228,8 @@ def secondStep(data_set: events.EventList, *date: Union[datetime.datetime, int],
 
 
 def thirdStep(data_set: events.EventList, *date: Union[int, datetime.datetime], peak_limit: float or None = None,
-              mask_frq: bool or None = False, bin_time_w: int = 0, limit_skip: float or None = None, limit_skip2: float or None = None) \
-        -> events.EventList:
+              mask_frq: bool or None = False, bin_time_w: int = 0, limit_skip: float or None = None, limit_skip2: float or None = None,
+              data_sets: List[data.DataPoint] or None = None) -> events.EventList:
     """
     second verification step with peak finder method, or initial very high correlation from first verification
     smaller timeframe (3 minutes around bursts)
@@ -204,6 +240,8 @@ def thirdStep(data_set: events.EventList, *date: Union[int, datetime.datetime],
     :param peak_limit: limit for peak finder method
     :param mask_frq: toggle dynamic frequency masking
     :param bin_time_w: #points to be merged into one point compared to default 4 points/second | 0 for no binning
+    :param data_sets: optional, DataPoints of the day (see dataSetDay()), the files get cut out of them instead of
+        reading them again
     :return:
     """
     if peak_limit is None:
@@ -241,21 +279,17 @@ def thirdStep(data_set: events.EventList, *date: Union[int, datetime.datetime],
         for j in obs:
             try:
                 d1 = data.createFromTime(
-                    i.time_start, station=j[0], extent=False)
+                    i.time_start, station=j[0], extent=False, data_sets=data_sets)
                 d2 = data.createFromTime(
-                    i.time_start, station=j[1], extent=False)
+                    i.time_start, station=j[1], extent=False, data_sets=data_sets)
                 if bin_time_w:
                     d1.binDataTime(bin_time_w)
                     d2.binDataTime(bin_time_w)
                 if mask_frq:
-                    mask1 = analysis.maskBadFrequencies(
+                    analysis.applyMaskBadFrequency(
                         d1, limit=analysis.mask_frq_limit)
-                    mask2 = analysis.maskBadFrequencies(
+                    analysis.applyMaskBadFrequency(
                         d2, limit=analysis.mask_frq_limit)
-                    d1.spectrum_data.data[mask1, :] = np.nanmean(
-                        d1.spectrum_data.data)
-                    d2.spectrum_data.data[mask2, :] = np.nanmean(
-                        d2.spectrum_data.data)
                 ev = analysis.peaksInData(d1, d2, peak_limit=peak_limit)
                 if i.inList(ev):
                     peak_list += ev
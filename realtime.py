@@ -27,6 +27,7 @@ import correlation
 import events
 import stations
 import download
+import manifest
 import nextcloud
 import data
 import steps
@@ -130,10 +131,8 @@ def getFiles(observatories: List[Union[str, stations.Station]]):
             observatories[i[0]] = stations.Station(i[1], stations.getFocusCode(datetime.datetime.today(), station=i[1]))
 
     # focus_codes = [stations.getFocusCode(datetime.datetime.today(), station=obs) for obs in observatories]
-    files_all = sorted(os.listdir(config.pathDataDay(datetime.datetime.today())))
-    files_stations = [[file for file in files_all
-                       if file.startswith(observatory.name + stations.seperator) and
-                       file.endswith(observatory.focus_code + config.file_ending)] for observatory in observatories]
+    manifest_today = manifest.getManifest(datetime.datetime.today())
+    files_stations = [manifest_today.files(observatory.name, observatory.focus_code) for observatory in observatories]
     files_filtered = dropOld(files_stations)
 
     return files_filtered
@@ -243,11 +242,11 @@ def saveImgToNextcloud(event_list: events.EventList):
         nextcloud.uploadToCloud(folder_event)
 
 
-def save(event_list, date=None):
+def save(event_list, date=None, data_sets=None):
     saveRealTime(event_list)
     saveRealtimeTxt(event_list)
     fileout.saveJson(event_list)
-    fileout.saveplots(event_list)
+    fileout.saveplots(event_list, data_sets=data_sets)
     #saveToNextCloud(event_list, date=date)
 
 
@@ -265,7 +264,7 @@ if __name__ == "__main__":
     f = getFiles(obs)
     e_list_old = loadRealTime(date=today)
 
-    sets = [sum([data.DataPoint(j) for j in i]) for i in f]
+    sets = [data.mergeDataPoints([data.DataPoint(j) for j in i]) for i in f]
     e_list_new = steps.firstStep(today, data_sets=sets)
 
     if not e_list_new:
@@ -274,7 +273,7 @@ if __name__ == "__main__":
         #saveRealtimeTxt(e_list_old)
         quit()
 
-    e_list_new2 = steps.secondStep(e_list_new, today)
+    e_list_new2 = steps.secondStep(e_list_new, today, data_sets=sets)
 
     if not e_list_new2:
         save(e_list_old)
@@ -282,7 +281,7 @@ if __name__ == "__main__":
         #saveRealtimeTxt(e_list_old)
         quit()
 
-    e_list_new3 = steps.secondStep(e_list_new2, today)
+    e_list_new3 = steps.secondStep(e_list_new2, today, data_sets=sets)
 
     if not e_list_new3:
         save(e_list_old)
@@ -290,7 +289,7 @@ if __name__ == "__main__":
         #saveRealtimeTxt(e_list_old)
         quit()
 
-    e_list_new4 = steps.thirdStep(e_list_new3, today)
+    e_list_new4 = steps.thirdStep(e_list_new3, today, data_sets=sets)
 
     if not e_list_new4:
         save(e_list_old)
@@ -299,6 +298,6 @@ if __name__ == "__main__":
         quit()
 
     e_list = e_list_old + e_list_new4
-    save(e_list)
+    save(e_list, data_sets=sets)
     #saveRealTime(e_list)
     #saveRealtimeTxt(e_list)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ -  ROBUST  -
+ - test_binning.py -
+
+data.reduceBins() against the loop over every time and bin it replaced in DataPoint.binDataFreq()
+"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+
+import data  # noqa: E402
+
+
+def binLoop(spectrum: np.ndarray, number_bins: int, method: str) -> np.ndarray:
+    """
+    frequency binning like DataPoint.binDataFreq() before reduceBins(), one nanmedian / nanmean per time and bin
+
+    :param spectrum: (frequency, time)
+    :param number_bins: number of frequency bins
+    :param method: 'median' or 'mean'
+    :return: (bin, time)
+    """
+    reduce = {'median': np.nanmedian, 'mean': np.nanmean}[method]
+    entries_per_bin = spectrum.shape[0] / number_bins
+    data_ = spectrum.transpose()
+    data_binned = [[] for _ in range(len(data_))]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for line in range(len(data_)):
+            for bin_ in range(number_bins):
+                data_binned[line].append(
+                    reduce(data_[line][int(bin_ * entries_per_bin):int((bin_ + 1) * entries_per_bin)]))
+    return np.array(data_binned).transpose()
+
+
+def binVectorized(spectrum: np.ndarray, number_bins: int, method: str) -> np.ndarray:
+    entries_per_bin = spectrum.shape[0] / number_bins
+    edges = [int(bin_ * entries_per_bin) for bin_ in range(number_bins + 1)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return data.reduceBins(spectrum, edges, method=method)
+
+
+def randomSpectrum(rng: np.random.Generator, dtype: str, frequencies: int, times: int, nan: bool) -> np.ndarray:
+    if dtype == 'uint8':
+        return rng.integers(0, 256, (frequencies, times), dtype=np.uint8)
+    spectrum = rng.normal(100, 30, (frequencies, times)).astype(dtype)
+    if nan:
+        spectrum[rng.random(spectrum.shape) < 0.2] = np.nan
+        spectrum[:, rng.integers(0, times)] = np.nan                # completely missing column
+        spectrum[rng.integers(0, frequencies), :] = np.nan          # completely missing channel
+    return spectrum
+
+
+@pytest.mark.parametrize("method", ['median', 'mean'])
+@pytest.mark.parametrize("dtype", ['uint8', 'float32', 'float64'])
+@pytest.mark.parametrize("frequencies, number_bins", [(200, 100), (200, 67), (193, 10), (7, 7), (5, 9)])
+def testReduceBinsLikeLoop(method, dtype, frequencies, number_bins):
+    rng = np.random.default_rng(frequencies * number_bins)
+    for nan in [False, True]:
+        spectrum = randomSpectrum(rng, dtype, frequencies, 50, nan)
+        expected = binLoop(spectrum, number_bins, method)
+        binned = binVectorized(spectrum, number_bins, method)
+        assert binned.dtype == expected.dtype
+        assert binned.shape == expected.shape
+        np.testing.assert_array_equal(binned, expected)
+
+
+@pytest.mark.parametrize("method", ['median', 'mean'])
+def testReduceBinsMaskedLikeNan(method):
+    rng = np.random.default_rng(0)
+    spectrum = rng.normal(100, 30, (60, 40)).astype(np.float32)
+    mask = rng.random(spectrum.shape) < 0.2
+    mask[:, 3] = True
+    nan = spectrum.copy()
+    nan[mask] = np.nan
+    np.testing.assert_array_equal(binVectorized(np.ma.masked_array(spectrum, mask=mask), 12, method),
+                                  binLoop(nan, 12, method))
+
+
+def testReduceBinsUnknownMethod():
+    with pytest.raises(ValueError):
+        data.reduceBins(np.zeros((4, 3)), [0, 2, 4], method='max')